@@ -0,0 +1,207 @@
+import threading
+
+import numpy as np
+import scipy.sparse as sp
+from django.conf import settings
+
+from .features import feature_store
+from .ranking import top_n
+
+
+class IVFIndex:
+    """
+    Inverted-file index for maximum inner product search over the feature matrix.
+
+    Vectors are augmented with one extra coordinate so that inner product
+    ranking becomes Euclidean nearest-neighbour ranking, clustered with
+    k-means, and a query only scores the rows of its `n_probe` nearest lists.
+    """
+
+    def __init__(self, n_lists=None, n_probe=8, n_iter=10, seed=0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.version = None
+        self.layout = None
+        self.matrix = None
+        self.centroids = None
+        self.order = None
+        self.offsets = None
+
+    def build(self, snapshot):
+        """
+        Cluster the rows of a feature snapshot into inverted lists.
+        """
+        matrix = snapshot.matrix
+        n_rows = len(matrix)
+        n_lists = self.n_lists or max(1, int(np.sqrt(n_rows)))
+        n_lists = min(n_lists, max(n_rows, 1))
+        augmented = self._augment(matrix)
+        if n_rows == 0:
+            self._set_lists(snapshot, augmented[:0], np.empty(0, dtype=np.intp), 0)
+            return self
+
+        rng = np.random.default_rng(self.seed)
+        centroids = augmented[rng.choice(n_rows, n_lists, replace=False)].copy()
+        assignment = np.zeros(n_rows, dtype=np.intp)
+        rows = np.arange(n_rows)
+        ones = np.ones(n_rows, dtype=np.float32)
+        for _ in range(self.n_iter):
+            assignment = self._nearest(augmented, centroids)
+            # Per-list sums in one pass, as a product with the sparse membership matrix
+            members = sp.csr_matrix((ones, (assignment, rows)), shape=(n_lists, n_rows))
+            counts = np.bincount(assignment, minlength=n_lists)
+            filled = counts > 0
+            sums = np.asarray(members @ augmented)
+            centroids[filled] = sums[filled] / counts[filled, None]
+
+        self._set_lists(snapshot, centroids, assignment, n_lists)
+        return self
+
+    def _set_lists(self, snapshot, centroids, assignment, n_lists):
+        self.version = snapshot.version
+        self.layout = snapshot.layout
+        self.matrix = snapshot.matrix
+        self.centroids = centroids
+        self.order = np.argsort(assignment, kind="stable")
+        self.offsets = np.searchsorted(
+            assignment[self.order], np.arange(n_lists + 1), side="left"
+        )
+
+    def search(self, query, k, allowed=None, n_probe=None):
+        """
+        Approximate top-k rows by inner product with `query`, best first.
+        `allowed` is an optional boolean mask over rows applied as a post-filter;
+        more lists are probed until k allowed rows are found or all were visited.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        n_lists = len(self.centroids)
+        if n_lists == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        n_probe = min(n_probe or self.n_probe, n_lists)
+
+        # Query has a zero in the augmented coordinate
+        distances = (
+            np.sum((self.centroids[:, :-1] - query) ** 2, axis=1)
+            + self.centroids[:, -1] ** 2
+        )
+        probe_order = np.argsort(distances)
+
+        while True:
+            lists = probe_order[:n_probe]
+            rows = np.concatenate(
+                [self.order[self.offsets[i] : self.offsets[i + 1]] for i in lists]
+            )
+            if allowed is not None:
+                rows = rows[allowed[rows]]
+            if len(rows) >= k or n_probe >= n_lists:
+                break
+            n_probe = min(n_probe * 2, n_lists)
+
+        scores = self.matrix[rows] @ query
+        selected = top_n(scores, k)
+        return rows[selected], scores[selected]
+
+    def save(self, path):
+        np.savez(
+            path,
+            version=self.version,
+            layout=self.layout,
+            n_probe=self.n_probe,
+            centroids=self.centroids,
+            order=self.order,
+            offsets=self.offsets,
+        )
+
+    @classmethod
+    def load(cls, path, snapshot):
+        """
+        Load an index saved with `save`. Returns None if it was built against
+        another feature layout or a catalogue of a different size.
+        """
+        data = np.load(path)
+        if str(data["layout"]) != snapshot.layout or len(data["order"]) != len(
+            snapshot
+        ):
+            return None
+        index = cls(n_probe=int(data["n_probe"]))
+        index.version = snapshot.version
+        index.layout = snapshot.layout
+        index.matrix = snapshot.matrix
+        index.centroids = data["centroids"]
+        index.order = data["order"]
+        index.offsets = data["offsets"]
+        return index
+
+    @staticmethod
+    def _augment(matrix):
+        norms = np.sum(matrix.astype(np.float64) ** 2, axis=1)
+        extra = np.sqrt(np.maximum(norms.max(initial=0.0) - norms, 0.0))
+        return np.hstack([matrix, extra[:, None].astype(matrix.dtype)])
+
+    @staticmethod
+    def _nearest(vectors, centroids, batch_size=65536):
+        assignment = np.empty(len(vectors), dtype=np.intp)
+        centroid_norms = np.sum(centroids**2, axis=1)
+        for start in range(0, len(vectors), batch_size):
+            batch = vectors[start : start + batch_size]
+            distances = centroid_norms - 2 * batch @ centroids.T
+            assignment[start : start + batch_size] = np.argmin(distances, axis=1)
+        return assignment
+
+
+class ANNIndexStore:
+    """
+    Process-wide IVF index of the current feature snapshot.
+    If settings.RECOMMENDER_ANN_INDEX points to an index built offline for the
+    current features, it is loaded. Otherwise the index is clustered in a
+    background thread, which takes seconds on the full catalogue, and `index`
+    returns None until it is ready so that callers score exactly meanwhile.
+    """
+
+    def __init__(self, store=feature_store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._index = None
+        self._building = None
+
+    def index(self, snapshot=None):
+        if snapshot is None:
+            snapshot = self.store.snapshot()
+        index = self._index
+        if index is not None and index.version == snapshot.version:
+            return index
+        with self._lock:
+            index = self._index
+            if index is not None and index.version == snapshot.version:
+                return index
+            if self._building == snapshot.version:
+                return None
+            path = getattr(settings, "RECOMMENDER_ANN_INDEX", None)
+            if path:
+                try:
+                    index = IVFIndex.load(path, snapshot)
+                except FileNotFoundError:
+                    index = None
+                if index is not None:
+                    self._index = index
+                    return index
+            self._building = snapshot.version
+            threading.Thread(target=self._build, args=(snapshot,), daemon=True).start()
+        return None
+
+    def _build(self, snapshot):
+        try:
+            index = IVFIndex().build(snapshot)
+            with self._lock:
+                if self._index is None or self._index.version < index.version:
+                    self._index = index
+        finally:
+            with self._lock:
+                # Let a failed build be retried by the next request
+                if self._building == snapshot.version:
+                    self._building = None
+
+
+ann_index = ANNIndexStore()
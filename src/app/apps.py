@@ -1,13 +1,12 @@
 from django.apps import AppConfig
-import os
-import logging
-import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
+from django.conf import settings
+import threading
 
 
 class ReviewFilterConfig(AppConfig):
     """
-    AppConfig class. Contains model for review filtering to be loaded only once.
+    AppConfig class. The review filtering model lives in `classifier.py` and is
+    loaded on the first classification, not at startup.
     """
 
     default_auto_field = "django.db.models.BigAutoField"
@@ -15,22 +14,27 @@ class ReviewFilterConfig(AppConfig):
     verbose_name = "Review Filter"
 
     def ready(self):
-        # Suppress logging for transformers, TF and torch
-        os.environ["TF_CPP_MIN_LOG_LEVEL"] = (
-            "2"  # Suppresses INFO and WARNING from TensorFlow
-        )
-        logging.getLogger("transformers").setLevel(logging.ERROR)
-        logging.getLogger("torch").setLevel(logging.ERROR)
-        logging.getLogger("tensorflow").setLevel(logging.ERROR)
-        # Load the model and tokenizer when the app is ready
-        self.model_name = "zayuki/computer_generated_fake_review_detection"
-        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-        self.model = AutoModelForSequenceClassification.from_pretrained(
-            self.model_name, from_tf=True
+        # Register signal handlers keeping in-memory indexes in sync with the database
+        from . import signals  # noqa: F401
+
+        # Memory-map the collaborative-filtering factors trained by `train_cf`
+        from .cf import cf_model
+
+        cf_model.load()
+
+        # Use the exported CPU model if one is configured
+        from .classifier import classifier
+
+        classifier.configure(
+            artifact=getattr(settings, "REVIEW_CLASSIFIER_ARTIFACT", None)
         )
 
-        # Check for GPU availability and move the model to GPU if available
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model.to(self.device)
+        # Optionally warm the classifier up without blocking startup
+        if getattr(settings, "REVIEW_CLASSIFIER_PRELOAD", False):
+            threading.Thread(target=classifier.load, daemon=True).start()
+
+        # Build the autocomplete index before the first keystroke arrives
+        if getattr(settings, "AUTOCOMPLETE_PRELOAD", False):
+            from .autocomplete import autocomplete_store
 
-        print("Model loaded and ready.")
+            threading.Thread(target=autocomplete_store.index, daemon=True).start()
@@ -0,0 +1,155 @@
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+from django.conf import settings
+
+from .models import Restaurant
+from .stores import LazyIndex
+
+
+def fold(text):
+    """
+    Lowercase `text`, strip accents and collapse whitespace: "Café  Olé" -> "cafe ole".
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+class SortedKeys:
+    """
+    Sorted UTF-8 keys packed into one buffer with their offsets, a sequence of
+    bytes that `bisect` can search. Byte order is code point order.
+    """
+
+    def __init__(self, keys):
+        encoded = [key.encode() for key in keys]
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(key) for key in encoded], out=self.offsets[1:])
+        self.buffer = b"".join(encoded)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.buffer[self.offsets[i] : self.offsets[i + 1]]
+
+    @property
+    def nbytes(self):
+        return len(self.buffer) + self.offsets.nbytes
+
+
+class AutocompleteIndex:
+    """
+    Restaurant names searchable by the prefix of any of their words.
+    Every word suffix of a folded name ("place 46 pizza", "46 pizza", "pizza") is
+    a key of a sorted array pointing back to the name, names carry a popularity
+    (their total review count). A prefix is the range of keys starting with it,
+    found by binary search; the top names of short prefixes are precomputed.
+    """
+
+    def __init__(self, names, popularity, max_key_length=64, precomputed=3, k=10):
+        self.names = names
+        self.popularity = np.asarray(popularity, dtype=np.int64)
+        self.max_key_length = max_key_length
+        self.k = k
+
+        entries = sorted(
+            (folded[start:][:max_key_length], i)
+            for i, folded in enumerate(fold(name) for name in names)
+            for start in [0] + [j + 1 for j, c in enumerate(folded) if c == " "]
+        )
+        self.keys = SortedKeys(key for key, _ in entries)
+        self.ids = np.array([i for _, i in entries], dtype=np.int32)
+
+        # Short prefixes match the most keys, answer them from a table
+        self.top = {}
+        for length in range(1, precomputed + 1):
+            prefixes = {key[:length] for key, _ in entries if len(key) >= length}
+            for prefix in prefixes:
+                self.top[prefix] = self._top_ids(*self._range(prefix), k)
+
+    @classmethod
+    def build(cls, rows, max_names=None, **kwargs):
+        """
+        Index rows of (name, review_count), keeping the `max_names` most reviewed names.
+        """
+        totals = {}
+        for name, review_count in rows:
+            totals[name] = totals.get(name, 0) + (review_count or 0)
+        names = sorted(totals, key=totals.get, reverse=True)[:max_names]
+        return cls(names, [totals[name] for name in names], **kwargs)
+
+    @property
+    def nbytes(self):
+        names = sum(len(name.encode()) for name in self.names)
+        top = sum(len(prefix.encode()) + ids.nbytes for prefix, ids in self.top.items())
+        return names + self.popularity.nbytes + self.keys.nbytes + self.ids.nbytes + top
+
+    def _range(self, prefix):
+        prefix = prefix.encode()
+        lo = bisect_left(self.keys, prefix)
+        # 0xFF never occurs in UTF-8, so it sorts after any continuation of the prefix
+        hi = bisect_left(self.keys, prefix + b"\xff", lo)
+        return lo, hi
+
+    def _top_ids(self, lo, hi, k):
+        ids = np.unique(self.ids[lo:hi])
+        if len(ids) > k:
+            # Partial selection, then the first of the names tied with the k-th
+            negated = -self.popularity[ids]
+            boundary = np.partition(negated, k - 1)[k - 1]
+            above = ids[negated < boundary]
+            tied = ids[negated == boundary]
+            ids = np.concatenate([above, tied[: k - len(above)]])
+        # Most popular first, then alphabetically by the index order
+        return ids[np.lexsort((ids, -self.popularity[ids]))]
+
+    def search(self, term, k=None):
+        """
+        Names of the `k` most popular restaurants with a word starting with `term`.
+        """
+        k = k or self.k
+        prefix = fold(term)[: self.max_key_length]
+        if not prefix:
+            return []
+        ids = self.top.get(prefix) if k <= self.k else None
+        if ids is None:
+            ids = self._top_ids(*self._range(prefix), k)
+        return [self.names[i] for i in ids[:k]]
+
+
+class AutocompleteStore(LazyIndex):
+    """
+    Process-wide autocomplete index of the `max_names` most reviewed names.
+    """
+
+    def __init__(self, max_names=None):
+        super().__init__()
+        self.max_names = max_names
+
+    def build(self) -> AutocompleteIndex:
+        return AutocompleteIndex.build(
+            Restaurant.objects.values_list("name", "review_count").iterator(),
+            max_names=self.max_names,
+        )
+
+    def search(self, term, k=10):
+        return self.index().search(term, k)
+
+    def stats(self):
+        index = self._index
+        if index is None:
+            return {"names": 0, "keys": 0, "prefixes": 0, "bytes": 0}
+        return {
+            "names": len(index.names),
+            "keys": len(index.keys),
+            "prefixes": len(index.top),
+            "bytes": index.nbytes,
+        }
+
+
+autocomplete_store = AutocompleteStore(
+    max_names=getattr(settings, "AUTOCOMPLETE_MAX_NAMES", None)
+)
@@ -0,0 +1,79 @@
+import threading
+
+import numpy as np
+
+from .features import BOOLEAN_FEATURES, feature_store
+
+
+class FilterBitmaps:
+    """
+    Packed bitmaps over the rows of a feature snapshot: one per boolean
+    attribute, price range, cuisine and ambience. A filter is the bitwise AND
+    of a few of them, 150k restaurants being about 19 KB per bitmap.
+    """
+
+    def __init__(self, snapshot):
+        self.version = snapshot.version
+        self.pks = snapshot.pks
+        self.bitmaps = {}
+
+        for i, column in enumerate(snapshot.columns):
+            values = snapshot.matrix[:, i]
+            if column in BOOLEAN_FEATURES:
+                self.bitmaps[column] = np.packbits(values == 1)
+            elif column == "price_range":
+                for price in np.unique(values[values > 0]):
+                    self.bitmaps[f"price_range_{int(price)}"] = np.packbits(
+                        values == price
+                    )
+            elif column.startswith(("cuisine_", "ambience_")):
+                self.bitmaps[column] = np.packbits(values == 1)
+
+    @property
+    def nbytes(self):
+        return sum(bitmap.nbytes for bitmap in self.bitmaps.values())
+
+    def match(self, keys):
+        """
+        Sorted primary keys of the restaurants having all of `keys`, such as
+        "delivery", "price_range_2" or "cuisine_12".
+        """
+        result = np.full((len(self.pks) + 7) // 8, 0xFF, dtype=np.uint8)
+        for key in keys:
+            bitmap = self.bitmaps.get(key)
+            if bitmap is None:
+                # Nothing has this attribute value
+                return self.pks[:0]
+            np.bitwise_and(result, bitmap, out=result)
+        rows = np.flatnonzero(np.unpackbits(result, count=len(self.pks)))
+        return self.pks[rows]
+
+
+class FilterEngine:
+    """
+    Process-wide filter bitmaps, rebuilt from the feature store when it changed.
+    The store goes stale when restaurants or their categories change in any
+    process; the first search after that rebuilds it, like `LazyIndex`.
+    """
+
+    def __init__(self, store=feature_store):
+        self.store = store
+        self._bitmaps = None
+        self._lock = threading.Lock()
+
+    def bitmaps(self):
+        snapshot = self.store.snapshot()
+        if self._bitmaps is None or self._bitmaps.version != snapshot.version:
+            with self._lock:
+                if self._bitmaps is None or self._bitmaps.version != snapshot.version:
+                    self._bitmaps = FilterBitmaps(snapshot)
+        return self._bitmaps
+
+    def match(self, keys):
+        """
+        Sorted primary keys of the restaurants matching all `keys`.
+        """
+        return self.bitmaps().match(keys)
+
+
+filter_engine = FilterEngine()
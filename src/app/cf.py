@@ -0,0 +1,213 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+
+
+def _solve_block(target, fixed, matrix, reg, start, stop):
+    """
+    Regularized least squares for rows start..stop of `matrix` against the fixed factors.
+    np.linalg.solve releases the GIL, so blocks run in parallel threads.
+    """
+    n_factors = fixed.shape[1]
+    identity = reg * np.eye(n_factors)
+    for i in range(start, stop):
+        lo, hi = matrix.indptr[i], matrix.indptr[i + 1]
+        if lo == hi:
+            target[i] = 0.0
+            continue
+        factors = fixed[matrix.indices[lo:hi]]
+        ratings = matrix.data[lo:hi]
+        target[i] = np.linalg.solve(
+            factors.T @ factors + identity * (hi - lo), factors.T @ ratings
+        )
+
+
+def train_als(
+    user_index,
+    item_index,
+    ratings,
+    n_users,
+    n_items,
+    factors=32,
+    reg=0.1,
+    iterations=10,
+    workers=None,
+    seed=0,
+    callback=None,
+):
+    """
+    Alternating least squares on explicit ratings, centered on the global mean.
+    Returns (user_factors, item_factors, global_mean).
+    """
+    # Only needed for training, not by the workers that load the model
+    import scipy.sparse as sp
+
+    ratings = np.asarray(ratings, dtype=np.float64)
+    global_mean = float(ratings.mean()) if len(ratings) else 0.0
+    by_user = sp.csr_matrix(
+        (ratings - global_mean, (user_index, item_index)), shape=(n_users, n_items)
+    )
+    by_item = by_user.T.tocsr()
+
+    rng = np.random.default_rng(seed)
+    user_factors = rng.normal(scale=0.1, size=(n_users, factors))
+    item_factors = rng.normal(scale=0.1, size=(n_items, factors))
+    workers = workers or os.cpu_count() or 1
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for iteration in range(iterations):
+            for target, fixed, matrix in (
+                (user_factors, item_factors, by_user),
+                (item_factors, user_factors, by_item),
+            ):
+                n_rows = matrix.shape[0]
+                block = max(1, -(-n_rows // (workers * 4)))
+                jobs = [
+                    pool.submit(
+                        _solve_block,
+                        target,
+                        fixed,
+                        matrix,
+                        reg,
+                        start,
+                        min(start + block, n_rows),
+                    )
+                    for start in range(0, n_rows, block)
+                ]
+                for job in jobs:
+                    job.result()
+
+            if callback is not None:
+                observed = by_user.tocoo()
+                predictions = np.sum(
+                    user_factors[observed.row] * item_factors[observed.col], axis=1
+                )
+                rmse = float(np.sqrt(np.mean((observed.data - predictions) ** 2)))
+                callback(iteration, rmse)
+
+    return (
+        user_factors.astype(np.float32),
+        item_factors.astype(np.float32),
+        global_mean,
+    )
+
+
+class CFModel:
+    """
+    Matrix-factorization model trained offline by `manage.py train_cf`.
+    Factors are memory-mapped, so workers share the pages of the same files.
+    """
+
+    def __init__(self, user_ids, item_ids, user_factors, item_factors, global_mean):
+        # user_ids and item_ids are sorted primary keys of User and Restaurant
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.global_mean = global_mean
+
+    def save(self, path):
+        """
+        Write the factors to a new directory inside `path`, then point
+        meta.json at it. Workers keep their mapping of the files they loaded,
+        the previous directory is kept for those reading meta.json meanwhile.
+        """
+        os.makedirs(path, exist_ok=True)
+        directory = tempfile.mkdtemp(prefix="factors-", dir=path)
+        # mkdtemp and mkstemp only let the owner read
+        os.chmod(directory, 0o755)
+        np.save(os.path.join(directory, "user_ids.npy"), self.user_ids)
+        np.save(os.path.join(directory, "item_ids.npy"), self.item_ids)
+        np.save(os.path.join(directory, "user_factors.npy"), self.user_factors)
+        np.save(os.path.join(directory, "item_factors.npy"), self.item_factors)
+
+        meta_path = os.path.join(path, "meta.json")
+        previous = None
+        if os.path.exists(meta_path):
+            with open(meta_path) as file:
+                previous = json.load(file).get("factors")
+        meta = {"global_mean": self.global_mean, "factors": os.path.basename(directory)}
+        fd, temp_path = tempfile.mkstemp(suffix=".json", dir=path)
+        with os.fdopen(fd, "w") as file:
+            json.dump(meta, file)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, meta_path)
+
+        for name in os.listdir(path):
+            if name.startswith("factors-") and name not in (meta["factors"], previous):
+                shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json")) as file:
+            meta = json.load(file)
+        # Models saved before versioned directories keep their files in `path`
+        directory = os.path.join(path, meta.get("factors", ""))
+
+        def array(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        return cls(
+            array("user_ids"),
+            array("item_ids"),
+            array("user_factors"),
+            array("item_factors"),
+            meta["global_mean"],
+        )
+
+    def user_vector(self, user_pk):
+        if user_pk is None or len(self.user_ids) == 0:
+            return None
+        i = np.searchsorted(self.user_ids, user_pk)
+        if i == len(self.user_ids) or self.user_ids[i] != user_pk:
+            return None
+        return np.asarray(self.user_factors[i])
+
+    def score(self, user_vector, item_pks):
+        """
+        Predicted ratings of the given restaurants.
+        Restaurants without reviews in the training data get the global mean.
+        """
+        item_pks = np.asarray(item_pks, dtype=np.int64)
+        scores = np.full(len(item_pks), self.global_mean, dtype=np.float32)
+        if len(self.item_ids) == 0:
+            return scores
+        rows = np.searchsorted(self.item_ids, item_pks)
+        rows[rows == len(self.item_ids)] = 0
+        known = self.item_ids[rows] == item_pks
+        scores[known] += self.item_factors[rows[known]] @ user_vector
+        return scores
+
+
+class CFModelStore:
+    """
+    Process-wide handle on the model saved at settings.RECOMMENDER_CF_MODEL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._model = None
+        self._loaded = False
+
+    def load(self):
+        path = getattr(settings, "RECOMMENDER_CF_MODEL", None)
+        with self._lock:
+            self._model = None
+            if path and os.path.exists(os.path.join(path, "meta.json")):
+                self._model = CFModel.load(path)
+            self._loaded = True
+        return self._model
+
+    def model(self):
+        if not self._loaded:
+            return self.load()
+        return self._model
+
+
+cf_model = CFModelStore()
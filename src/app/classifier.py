@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+import threading
+
+MODEL_NAME = "zayuki/computer_generated_fake_review_detection"
+# Written next to an exported model by `manage.py export_review_classifier`
+RUNTIME_CONFIG = "runtime.json"
+
+
+def suppress_framework_logging():
+    # Suppress logging for transformers, TF and torch
+    os.environ["TF_CPP_MIN_LOG_LEVEL"] = (
+        "2"  # Suppresses INFO and WARNING from TensorFlow
+    )
+    logging.getLogger("transformers").setLevel(logging.ERROR)
+    logging.getLogger("torch").setLevel(logging.ERROR)
+    logging.getLogger("tensorflow").setLevel(logging.ERROR)
+
+
+def forward_order(parameters, names):
+    """
+    `names` in the order of the `parameters` of a forward method, the order
+    traced models take their inputs positionally in. The tokenizer order differs:
+    BERT tokenizers give token_type_ids before attention_mask, forward takes
+    it after. Names that are not all parameters are returned unchanged.
+    """
+    parameters = list(parameters)
+    if not all(name in parameters for name in names):
+        return list(names)
+    return sorted(names, key=parameters.index)
+
+
+class ReviewClassifier:
+    """
+    Fake-review classifier. torch and transformers are imported and the model
+    is loaded on first use, so importing Django does not pay for them.
+
+    Without `artifact` the full-precision PyTorch model is used. Otherwise
+    `artifact` is a directory written by `export_review_classifier`, holding a
+    dynamically int8-quantized ONNX or TorchScript model and its tokenizer.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, artifact=None):
+        self.model_name = model_name
+        self.artifact = artifact
+        self.runtime = None
+        self.model = None
+        self.tokenizer = None
+        self.device = None
+        self.max_length = None
+        self.input_names = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        return self.model is not None
+
+    def configure(self, artifact=None):
+        """
+        Switch to another model; it is loaded again on next use.
+        """
+        with self._lock:
+            self.artifact = artifact
+            self.model = None
+
+    def load(self):
+        if self.model is not None:
+            return self
+        with self._lock:
+            if self.model is not None:
+                return self
+            suppress_framework_logging()
+            if self.artifact:
+                self._load_artifact()
+            else:
+                self._load_pytorch()
+            print("Model loaded and ready.")
+        return self
+
+    def _load_pytorch(self):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(
+            self.model_name, from_tf=True
+        )
+
+        # Check for GPU availability and move the model to GPU if available
+        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        model.to(self.device)
+        model.eval()
+
+        self.runtime = "pytorch"
+        self.tokenizer = tokenizer
+        self.model = model
+
+    def _load_artifact(self):
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(self.artifact, RUNTIME_CONFIG)) as file:
+            config = json.load(file)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.artifact)
+        self.input_names = config["input_names"]
+        self.max_length = config.get("max_length")
+
+        if config["format"] == "onnx":
+            import onnxruntime
+
+            self.model = onnxruntime.InferenceSession(
+                os.path.join(self.artifact, "model.onnx"),
+                providers=["CPUExecutionProvider"],
+            )
+        else:
+            import torch
+
+            self.model = torch.jit.load(os.path.join(self.artifact, "model.pt"))
+            self.model.eval()
+            # Artifacts exported in tokenizer order are fed in forward order too
+            arguments = [arg.name for arg in self.model.forward.schema.arguments]
+            self.input_names = forward_order(arguments[1:], self.input_names)
+        self.device = "cpu"
+        self.runtime = config["format"]
+
+    def encode_options(self):
+        """
+        Tokenizer arguments producing the inputs `forward` expects.
+        """
+        self.load()
+        if self.runtime == "onnx":
+            return {"return_tensors": "np", "padding": True, "truncation": True}
+        if self.runtime == "torchscript":
+            # Traced models expect the sequence length they were traced with
+            return {
+                "return_tensors": "pt",
+                "padding": "max_length",
+                "truncation": True,
+                "max_length": self.max_length,
+            }
+        return {"return_tensors": "pt", "padding": True, "truncation": True}
+
+    def encode(self, texts):
+        return self.tokenizer(list(texts), **self.encode_options())
+
+    def forward(self, inputs):
+        """
+        Raw classifier outputs for encoded texts, as a NumPy array.
+        """
+        self.load()
+        if self.runtime == "onnx":
+            feed = {name: inputs[name].astype("int64") for name in self.input_names}
+            return self.model.run(None, feed)[0]
+
+        # Only the PyTorch runtimes need torch installed
+        import torch
+
+        if self.runtime == "torchscript":
+            with torch.inference_mode():
+                outputs = self.model(*[inputs[name] for name in self.input_names])
+            return outputs[0].numpy()
+
+        inputs = {key: value.to(self.device) for key, value in inputs.items()}
+        with torch.inference_mode():
+            outputs = self.model(**inputs)
+        return outputs.logits.cpu().numpy()
+
+    def logits(self, texts):
+        return self.forward(self.encode(texts))
+
+    def predict(self, texts):
+        """
+        Classify review texts, True meaning computer-generated.
+        """
+        return [prediction == 1 for prediction in self.logits(texts).argmax(axis=-1)]
+
+
+classifier = ReviewClassifier()
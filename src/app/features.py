@@ -0,0 +1,193 @@
+import hashlib
+import threading
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .models import Restaurant, Cuisine, Ambience
+from .stores import catalog_version
+
+if TYPE_CHECKING:
+    # pandas is only imported when the matrix is built, not at startup
+    import pandas as pd
+
+# Restaurant columns used as features, in matrix order
+BOOLEAN_FEATURES = [
+    "good_for_kids",
+    "good_for_groups",
+    "take_out",
+    "reservations",
+    "delivery",
+    "outdoor_seating",
+    "wheelchair_accessible",
+    "bike_parking",
+    "credit_cards_accepted",
+    "alcohol",
+    "happy_hour",
+    "dogs_allowed",
+    "sustainable",
+    "parking",
+]
+NUMERIC_FEATURES = ["price_range", "rating", "review_count"]
+
+
+def prepare_features(df: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Turn raw Restaurant columns into numeric features.
+    Missing attributes count as absent and rating/review_count are z-scored.
+    """
+    feature_df = df[BOOLEAN_FEATURES + NUMERIC_FEATURES].astype("float64").fillna(0.0)
+    for column in ["rating", "review_count"]:
+        std = feature_df[column].std()
+        feature_df[column] = (feature_df[column] - feature_df[column].mean()) / (
+            std if std else 1.0
+        )
+    return feature_df
+
+
+class FeatureSnapshot:
+    """
+    Immutable, versioned view of the feature matrix.
+    Row i of `matrix` holds the features of the restaurant with primary key `pks[i]`,
+    `ratings[i]` its raw rating.
+    """
+
+    def __init__(self, version, pks, matrix, columns, ratings=None):
+        self.version = version
+        self.pks = pks
+        self.matrix = matrix
+        self.columns = columns
+        self.ratings = ratings if ratings is not None else np.zeros(len(pks))
+        # Fingerprint of the column layout, used to detect stale user profiles
+        self.layout = hashlib.sha1(",".join(columns).encode()).hexdigest()
+
+    def __len__(self):
+        return len(self.pks)
+
+    def lookup(self, pks):
+        """
+        Map restaurant primary keys to matrix rows.
+        Returns the row indices of the known keys and a mask marking which keys are known.
+        """
+        pks = np.asarray(pks, dtype=np.int64)
+        if len(self.pks) == 0:
+            return np.empty(0, dtype=np.intp), np.zeros(len(pks), dtype=bool)
+        rows = np.searchsorted(self.pks, pks)
+        rows[rows == len(self.pks)] = 0
+        known = self.pks[rows] == pks
+        return rows[known], known
+
+
+class FeatureStore:
+    """
+    Process-wide store of restaurant features.
+    The matrix is built on first use and rebuilt lazily after `invalidate` or
+    once `version` changed, which any process does on Restaurant, Cuisine and
+    Ambience changes (app/stores.py).
+    """
+
+    def __init__(self, version=catalog_version):
+        self.version = version
+        self._built = None
+        self._lock = threading.Lock()
+        self._stale = True
+        self._snapshot = FeatureSnapshot(
+            0, np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32), []
+        )
+
+    @property
+    def is_stale(self):
+        # Also stale when another process changed the restaurants
+        return self._stale or self.version.current() != self._built
+
+    def invalidate(self):
+        self._stale = True
+
+    def snapshot(self) -> FeatureSnapshot:
+        if self.is_stale:
+            with self._lock:
+                if self.is_stale:
+                    self.build()
+        return self._snapshot
+
+    def build(self):
+        # Clear the flag first so that changes made during the build trigger another one
+        self._stale = False
+        self._built = self.version.current()
+        try:
+            self._build()
+        except BaseException:
+            self._stale = True
+            raise
+
+    def _build(self):
+        import pandas as pd
+
+        rows = Restaurant.objects.order_by("pk").values_list(
+            "pk", *BOOLEAN_FEATURES, *NUMERIC_FEATURES
+        )
+        df = pd.DataFrame.from_records(
+            list(rows), columns=["pk"] + BOOLEAN_FEATURES + NUMERIC_FEATURES
+        )
+        pks = df["pk"].to_numpy(dtype=np.int64)
+        base = prepare_features(df)
+
+        # One-hot encode cuisines and ambiences from the M2M through tables
+        cuisine_ids = np.fromiter(
+            Cuisine.objects.order_by("pk").values_list("pk", flat=True), dtype=np.int64
+        )
+        ambience_ids = np.fromiter(
+            Ambience.objects.order_by("pk").values_list("pk", flat=True), dtype=np.int64
+        )
+        n_base = base.shape[1]
+        matrix = np.zeros(
+            (len(pks), n_base + len(cuisine_ids) + len(ambience_ids)), dtype=np.float32
+        )
+        matrix[:, :n_base] = base.to_numpy()
+
+        self._one_hot(
+            matrix,
+            pks,
+            cuisine_ids,
+            Restaurant.cuisines.through.objects.values_list(
+                "restaurant_id", "cuisine_id"
+            ),
+            offset=n_base,
+        )
+        self._one_hot(
+            matrix,
+            pks,
+            ambience_ids,
+            Restaurant.ambiences.through.objects.values_list(
+                "restaurant_id", "ambience_id"
+            ),
+            offset=n_base + len(cuisine_ids),
+        )
+
+        columns = (
+            list(base.columns)
+            + [f"cuisine_{pk}" for pk in cuisine_ids]
+            + [f"ambience_{pk}" for pk in ambience_ids]
+        )
+        self._snapshot = FeatureSnapshot(
+            self._snapshot.version + 1,
+            pks,
+            matrix,
+            columns,
+            ratings=df["rating"].to_numpy(dtype=np.float64),
+        )
+
+    @staticmethod
+    def _one_hot(matrix, pks, category_ids, links, offset):
+        links = np.array(list(links), dtype=np.int64).reshape(-1, 2)
+        if len(links) == 0 or len(pks) == 0 or len(category_ids) == 0:
+            return
+        rows = np.searchsorted(pks, links[:, 0])
+        cols = np.searchsorted(category_ids, links[:, 1])
+        rows[rows == len(pks)] = 0
+        cols[cols == len(category_ids)] = 0
+        known = (pks[rows] == links[:, 0]) & (category_ids[cols] == links[:, 1])
+        matrix[rows[known], offset + cols[known]] = 1.0
+
+
+feature_store = FeatureStore()
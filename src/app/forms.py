@@ -1,5 +1,16 @@
 from django import forms
-from .models import Cuisine, Ambience
+from .pagination import decode_cursor
+from .search import help_text
+from .vocabularies import ambiences, cuisines
+
+
+# Functions rather than bound methods: form fields are deep-copied per form
+def cuisine_choices():
+    return cuisines.choices()
+
+
+def ambience_choices():
+    return ambiences.choices()
 
 
 class RestaurantFilterForm(forms.Form):
@@ -8,14 +19,25 @@ class RestaurantFilterForm(forms.Form):
         required=False,
         max_length=100,
         label="Restaurant name",
+        help_text=help_text(),
         widget=forms.TextInput(attrs={"placeholder": "Search by name"}),
     )
-    # Filter by cuisine and ambience
-    cuisine = forms.ModelChoiceField(queryset=Cuisine.objects.all(), required=False)
-    ambience = forms.ModelChoiceField(queryset=Ambience.objects.all(), required=False)
+    # Filter by cuisine and ambience, choices come from the cached vocabularies
+    cuisine = forms.TypedChoiceField(
+        choices=cuisine_choices, coerce=int, empty_value=None, required=False
+    )
+    ambience = forms.TypedChoiceField(
+        choices=ambience_choices, coerce=int, empty_value=None, required=False
+    )
 
     # filter for opening hours
     open_now = forms.BooleanField(required=False, label="Open Now")
+    open_for = forms.IntegerField(
+        required=False,
+        min_value=5,
+        max_value=24 * 60,
+        label="Open for at least (minutes)",
+    )
 
     # Filter by rating (1 to 5 with 0.5 increments)
     min_rating = forms.DecimalField(
@@ -29,7 +51,23 @@ class RestaurantFilterForm(forms.Form):
     )
 
     # Filter by location (city)
-    city = forms.CharField(max_length=100, required=False, label="City")
+    city = forms.CharField(
+        max_length=100, required=False, label="City", help_text=help_text()
+    )
+
+    # Filter by distance: restaurants within `radius` km, or the `nearest` ones
+    latitude = forms.FloatField(
+        required=False, min_value=-90, max_value=90, widget=forms.HiddenInput
+    )
+    longitude = forms.FloatField(
+        required=False, min_value=-180, max_value=180, widget=forms.HiddenInput
+    )
+    radius = forms.FloatField(
+        required=False, min_value=0.1, max_value=100, label="Within (km)"
+    )
+    nearest = forms.IntegerField(
+        required=False, min_value=1, max_value=500, label="Nearest restaurants"
+    )
 
     # Filter by price range
     price_range = forms.ChoiceField(
@@ -58,3 +96,31 @@ class RestaurantFilterForm(forms.Form):
     sustainable = forms.BooleanField(
         required=False, label="Feeling sustainable", initial=False
     )
+
+    # Pagination of /api/restaurants/, not filters
+    cursor = forms.CharField(required=False, widget=forms.HiddenInput)
+    page_size = forms.IntegerField(
+        required=False, min_value=1, max_value=500, widget=forms.HiddenInput
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        located = [
+            cleaned_data.get(field) is not None for field in ("latitude", "longitude")
+        ]
+        if any(located) and not all(located):
+            raise forms.ValidationError("Give both latitude and longitude.")
+        if not any(located) and (
+            cleaned_data.get("radius") or cleaned_data.get("nearest")
+        ):
+            raise forms.ValidationError("Distance filters need a location.")
+        return cleaned_data
+
+    def clean_cursor(self):
+        cursor = self.cleaned_data.get("cursor")
+        if not cursor:
+            return None
+        try:
+            return decode_cursor(cursor)
+        except ValueError:
+            raise forms.ValidationError("Invalid cursor.")
@@ -0,0 +1,156 @@
+import math
+
+import numpy as np
+
+from .models import Restaurant
+from .stores import LazyIndex
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat, lon, lats, lons):
+    """
+    Great-circle distances in kilometres from (lat, lon) to arrays of coordinates.
+    """
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = (
+        np.sin((lats - lat) / 2) ** 2
+        + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GeoIndex:
+    """
+    Restaurant coordinates bucketed into a grid of `cell_degrees` cells.
+    Points are sorted by cell, row-major, so the cells of one grid row within a
+    bounding box are a single slice; distances are only computed for the points
+    of the few cells a search circle overlaps.
+    """
+
+    def __init__(self, pks, lats, lons, cell_degrees=0.05):
+        self.cell_degrees = cell_degrees
+        self.n_cols = math.ceil(360 / cell_degrees)
+
+        pks = np.asarray(pks, dtype=np.int64)
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        cells = self._row(lats) * self.n_cols + self._col(lons)
+        order = np.argsort(cells, kind="stable")
+        self.pks, self.lats, self.lons = pks[order], lats[order], lons[order]
+        # Sorted cell ids and where their points start
+        self.cells, starts = np.unique(cells[order], return_index=True)
+        self.starts = np.append(starts, len(order))
+
+    @classmethod
+    def build(cls, rows, **kwargs):
+        """
+        Index rows of (pk, latitude, longitude), skipping missing coordinates.
+        """
+        points = np.array(
+            [row for row in rows if row[1] is not None and row[2] is not None],
+            dtype=np.float64,
+        ).reshape(-1, 3)
+        return cls(points[:, 0], points[:, 1], points[:, 2], **kwargs)
+
+    def __len__(self):
+        return len(self.pks)
+
+    @property
+    def nbytes(self):
+        return (
+            self.pks.nbytes
+            + self.lats.nbytes
+            + self.lons.nbytes
+            + self.cells.nbytes
+            + self.starts.nbytes
+        )
+
+    def _row(self, lats):
+        rows = np.floor((np.asarray(lats) + 90) / self.cell_degrees).astype(np.int64)
+        return np.clip(rows, 0, math.ceil(180 / self.cell_degrees) - 1)
+
+    def _col(self, lons):
+        cols = np.floor((np.asarray(lons) + 180) / self.cell_degrees).astype(np.int64)
+        return cols % self.n_cols
+
+    def _candidates(self, lat, lon, radius_km):
+        # Rows of the points in the cells overlapping the circle's bounding box
+        dlat = radius_km / KM_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+        dlon = radius_km / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-9 else 360.0
+
+        first_row, last_row = self._row([lat - dlat, lat + dlat])
+        if dlon >= 180:
+            col_ranges = [(0, self.n_cols - 1)]
+        else:
+            first_col, last_col = self._col([lon - dlon, lon + dlon])
+            if first_col <= last_col:
+                col_ranges = [(first_col, last_col)]
+            else:
+                # The box crosses the antimeridian
+                col_ranges = [(first_col, self.n_cols - 1), (0, last_col)]
+
+        rows = np.arange(first_row, last_row + 1)
+        firsts, lasts = [], []
+        for first_col, last_col in col_ranges:
+            # The cells of one grid row between two columns are contiguous
+            lo = np.searchsorted(self.cells, rows * self.n_cols + first_col)
+            hi = np.searchsorted(
+                self.cells, rows * self.n_cols + last_col, side="right"
+            )
+            firsts.append(self.starts[lo])
+            lasts.append(self.starts[hi])
+        firsts, lasts = np.concatenate(firsts), np.concatenate(lasts)
+
+        # Concatenated ranges firsts[i]:lasts[i]
+        lengths = lasts - firsts
+        offsets = np.cumsum(lengths) - lengths
+        return np.repeat(firsts - offsets, lengths) + np.arange(lengths.sum())
+
+    def within(self, lat, lon, radius_km):
+        """
+        Sorted primary keys of the restaurants within `radius_km` of (lat, lon),
+        with their distances.
+        """
+        rows = self._candidates(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self.lats[rows], self.lons[rows])
+        inside = distances <= radius_km
+        pks, distances = self.pks[rows[inside]], distances[inside]
+        order = np.argsort(pks)
+        return pks[order], distances[order]
+
+    def nearest(self, lat, lon, n, max_radius_km=None, among=None):
+        """
+        Primary keys of the `n` restaurants closest to (lat, lon), closest first,
+        with their distances, optionally only counting the sorted keys `among`.
+        The search circle doubles until it holds `n` of them.
+        """
+        limit = max_radius_km or math.pi * EARTH_RADIUS_KM
+        radius = min(self.cell_degrees * KM_PER_DEGREE, limit)
+        while True:
+            pks, distances = self.within(lat, lon, radius)
+            if among is not None:
+                kept = np.isin(pks, among, assume_unique=True)
+                pks, distances = pks[kept], distances[kept]
+            if len(pks) >= n or radius >= limit:
+                break
+            radius = min(radius * 2, limit)
+        order = np.lexsort((pks, distances))[:n]
+        return pks[order], distances[order]
+
+
+class GeoStore(LazyIndex):
+    """
+    Process-wide spatial index of restaurant coordinates, see `LazyIndex`.
+    """
+
+    def build(self) -> GeoIndex:
+        return GeoIndex.build(
+            Restaurant.objects.values_list("pk", "latitude", "longitude")
+        )
+
+
+geo_store = GeoStore()
@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+import numpy as np
+
+from .models import Restaurant
+from .stores import LazyIndex
+
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SLOTS_PER_WEEK = 7 * SLOTS_PER_DAY  # 2016
+
+
+def slot_of(when):
+    """
+    Five-minute slot of the week a datetime falls in, Monday 00:00 being slot 0.
+    """
+    minutes = when.hour * 60 + when.minute
+    return when.weekday() * SLOTS_PER_DAY + minutes // SLOT_MINUTES
+
+
+def week_slots(hours):
+    """
+    Boolean array over the slots of the week in which a restaurant is open.
+    `hours` holds (open, close) times per day, Monday first. Hours closing at or
+    before they open run past midnight; equal times mean open all day.
+    A slot is open only if the restaurant is open for all of it: 9:03-17:02
+    gives the slots from 9:05 to 16:55.
+    """
+    week = np.zeros(SLOTS_PER_WEEK, dtype=bool)
+    for day, (open_time, close_time) in enumerate(hours):
+        if open_time is None or close_time is None:
+            continue
+        opens = open_time.hour * 60 + open_time.minute
+        closes = close_time.hour * 60 + close_time.minute
+        if closes <= opens:
+            closes += 24 * 60
+        # First slot starting at or after opening, last one ending by closing
+        start = day * SLOTS_PER_DAY + -(-opens // SLOT_MINUTES)
+        end = day * SLOTS_PER_DAY + closes // SLOT_MINUTES
+        # Sunday night hours wrap around to Monday morning
+        week[np.arange(start, end) % SLOTS_PER_WEEK] = True
+    return week
+
+
+class OpeningHoursIndex:
+    """
+    Opening hours of all restaurants as a packed bitmap of 2016 five-minute
+    slots per restaurant (252 bytes each), built from the `*_open`/`*_close` fields.
+    """
+
+    def __init__(self, pks, slots):
+        self.pks = pks
+        self.slots = slots
+
+    @classmethod
+    def build(cls, rows):
+        """
+        Index rows of (pk, monday_open, monday_close, ..., sunday_close) sorted by pk.
+        """
+        rows = list(rows)
+        pks = np.array([row[0] for row in rows], dtype=np.int64)
+        slots = np.zeros((len(rows), SLOTS_PER_WEEK // 8), dtype=np.uint8)
+        for i, row in enumerate(rows):
+            hours = zip(row[1::2], row[2::2])
+            slots[i] = np.packbits(week_slots(hours))
+        return cls(pks, slots)
+
+    @property
+    def nbytes(self):
+        return self.pks.nbytes + self.slots.nbytes
+
+    def _bits(self, slots):
+        # Columns of the given slots, one row per restaurant
+        slots = np.asarray(slots) % SLOTS_PER_WEEK
+        return (self.slots[:, slots >> 3] >> (7 - (slots & 7)).astype(np.uint8)) & 1
+
+    def open_at(self, when):
+        """
+        Sorted primary keys of the restaurants open at `when`.
+        """
+        return self.pks[self._bits([slot_of(when)])[:, 0].astype(bool)]
+
+    def open_during(self, when, minutes):
+        """
+        Sorted primary keys of the restaurants open from `when` for the next
+        `minutes`, without closing in between.
+        """
+        start = slot_of(when)
+        # Up to the slot of the last instant of the window, which may start mid-slot
+        end = max(when, when + timedelta(minutes=minutes) - timedelta(microseconds=1))
+        count = (slot_of(end) - start) % SLOTS_PER_WEEK + 1
+        bits = self._bits(np.arange(start, start + count))
+        return self.pks[bits.all(axis=1)]
+
+
+class OpeningHoursStore(LazyIndex):
+    """
+    Process-wide opening-hours index, see `LazyIndex`.
+    """
+
+    def build(self) -> OpeningHoursIndex:
+        fields = [f"{day}_{end}" for day in DAYS for end in ("open", "close")]
+        return OpeningHoursIndex.build(
+            Restaurant.objects.order_by("pk").values_list("pk", *fields)
+        )
+
+
+hours_store = OpeningHoursStore()
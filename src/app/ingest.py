@@ -0,0 +1,236 @@
+import csv
+import importlib
+import io
+import multiprocessing
+import os
+import time
+from collections import deque
+
+from tqdm import tqdm
+
+# Set in every worker process by _init_worker
+_parse_row = None
+_columns = None
+
+
+class IngestStats:
+    """
+    Counters reported by `ingest` once the whole file was processed.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.parsed = 0
+        self.errors = 0
+        self.written = 0
+        self.offset = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.rows / max(self.elapsed, 1e-9)
+
+
+def read_header(path):
+    """
+    Column names of a CSV file and the byte offset of its first data row.
+    """
+    with open(path, "rb") as file:
+        line = file.readline()
+        return next(csv.reader([line.decode("utf-8-sig")])), file.tell()
+
+
+def split_records(path, start, chunk_bytes, block_size=1 << 22):
+    """
+    Split a CSV file into byte ranges of roughly `chunk_bytes`, starting at `start`.
+    Ranges end on line boundaries outside quoted fields, so multi-line values
+    (review texts) are never cut in two.
+    """
+    ranges = []
+    with open(path, "rb") as file:
+        file.seek(start)
+        range_start = block_start = start
+        quoted = False
+
+        while True:
+            block = file.read(block_size)
+            if not block:
+                break
+            # Track quote parity up to the first candidate boundary of the block
+            pos = max(range_start + chunk_bytes - block_start, 0)
+            if pos >= len(block):
+                quoted ^= bool(block.count(b'"') & 1)
+                block_start += len(block)
+                continue
+            quoted ^= bool(block.count(b'"', 0, pos) & 1)
+
+            while True:
+                newline = block.find(b"\n", pos)
+                if newline == -1:
+                    quoted ^= bool(block.count(b'"', pos) & 1)
+                    break
+                quoted ^= bool(block.count(b'"', pos, newline) & 1)
+                pos = newline + 1
+                if quoted:
+                    continue
+
+                ranges.append((range_start, block_start + pos))
+                range_start = block_start + pos
+                target = range_start + chunk_bytes - block_start
+                if target >= len(block):
+                    quoted ^= bool(block.count(b'"', pos) & 1)
+                    break
+                quoted ^= bool(block.count(b'"', pos, target) & 1)
+                pos = target
+
+            block_start += len(block)
+
+        if range_start < block_start:
+            ranges.append((range_start, block_start))
+    return ranges
+
+
+def _init_worker(parse_row, columns, field_size_limit):
+    global _parse_row, _columns
+    if isinstance(parse_row, str):
+        # Spawned workers (Windows, macOS) start without Django, and the module
+        # defining the parser usually imports the models: set Django up first
+        import django
+        from django.apps import apps
+
+        if not apps.ready:
+            django.setup()
+        module, name = parse_row.rsplit(".", 1)
+        parse_row = getattr(importlib.import_module(module), name)
+    _parse_row = parse_row
+    _columns = columns
+    csv.field_size_limit(field_size_limit)
+
+
+def _parse_range(task):
+    """
+    Parse and convert the rows of one byte range.
+    Returns the end of the range, the number of rows and errors, and the parsed rows.
+    """
+    path, start, end = task
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+
+    rows = errors = 0
+    results = []
+    for row in csv.reader(io.StringIO(data.decode("utf-8"), newline="")):
+        if not row:
+            continue
+        rows += 1
+        try:
+            # Only the used columns are looked up, other fields are dropped with the row
+            parsed = _parse_row({name: row[i] for name, i in _columns})
+        except (IndexError, KeyError, ValueError):
+            errors += 1
+            continue
+        if parsed is not None:
+            results.append(parsed)
+    return end, rows, errors, results
+
+
+def _imap_bounded(pool, func, tasks, window):
+    """
+    Like `pool.imap`, in order, but with at most `window` tasks submitted and not
+    yet consumed, so parsers cannot run ahead of a slow writer and pile up rows.
+    """
+    pending = deque()
+    for task in tasks:
+        if len(pending) >= window:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(func, (task,)))
+    while pending:
+        yield pending.popleft().get()
+
+
+def ingest(
+    path,
+    parse_row,
+    write_batch,
+    workers=1,
+    batch_size=5000,
+    chunk_bytes=8 << 20,
+    start_offset=None,
+    usecols=None,
+    field_size_limit=131072,
+):
+    """
+    Load a CSV file with a pool of parser processes and a single writer.
+
+    The file is split into byte ranges of whole records which `workers` processes
+    parse with `parse_row(row_dict)`, a picklable module-level function returning
+    plain values, or None to drop the row. Rows raising KeyError or ValueError,
+    or too short, are counted as errors.
+
+    `row_dict` only holds the `usecols` columns (all of them if None); a column
+    missing from the header raises KeyError. The csv module still tokenizes
+    every field of a row, so wide unused columns exist as strings, and must fit
+    `field_size_limit`, until the row is dropped, but they are never copied
+    into the dicts nor kept across rows. At most 2 x `workers` ranges are parsed ahead of the
+    writer, bounding memory. Parsed rows are handed, in file order, to
+    `write_batch(rows, resume_offset)` in this process, in batches of at most
+    `batch_size`; `resume_offset` is a safe `start_offset` for a later run.
+    """
+    fieldnames, data_start = read_header(path)
+    positions = {name: i for i, name in enumerate(fieldnames)}
+    if usecols is None:
+        usecols = fieldnames
+    missing = [name for name in usecols if name not in positions]
+    if missing:
+        raise KeyError(", ".join(missing))
+    columns = [(name, positions[name]) for name in usecols]
+    start = max(start_offset or 0, data_start)
+    tasks = [(path, lo, hi) for lo, hi in split_records(path, start, chunk_bytes)]
+    stats = IngestStats()
+    stats.offset = start
+
+    if workers > 1:
+        # Passed by name, so that unpickling it does not import Django in the worker
+        pool = multiprocessing.Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(
+                f"{parse_row.__module__}.{parse_row.__qualname__}",
+                columns,
+                field_size_limit,
+            ),
+        )
+        chunks = _imap_bounded(pool, _parse_range, tasks, window=2 * workers)
+    else:
+        pool = None
+        _init_worker(parse_row, columns, field_size_limit)
+        chunks = map(_parse_range, tasks)
+
+    try:
+        with tqdm(
+            total=os.path.getsize(path) - start, unit="B", unit_scale=True
+        ) as progress:
+            for end, rows, errors, results in chunks:
+                stats.rows += rows
+                stats.errors += errors
+                stats.parsed += len(results)
+                for i in range(0, len(results), batch_size):
+                    batch = results[i : i + batch_size]
+                    # The offset is only safe once the last batch of the range is written
+                    last = i + batch_size >= len(results)
+                    stats.written += write_batch(batch, end if last else stats.offset)
+                progress.update(end - stats.offset)
+                stats.offset = end
+    except BaseException:
+        if pool is not None:
+            pool.terminate()
+        raise
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return stats
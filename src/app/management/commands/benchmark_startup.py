@@ -0,0 +1,65 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter, so imports and model loading are measured cold
+PROBE = """
+import json, os, time
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", {settings_module!r})
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter() - start
+classifier_load = None
+if {eager}:
+    from app.classifier import classifier
+    start = time.perf_counter()
+    classifier.load()
+    classifier_load = time.perf_counter() - start
+print(json.dumps({{"setup": setup, "classifier_load": classifier_load}}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measure django.setup() time with lazy and eager review classifier loading"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument(
+            "--skip-eager",
+            action="store_true",
+            help="Only measure the lazy startup (no model download needed).",
+        )
+
+    def handle(self, *args, **options):
+        modes = [("lazy", False)] + ([] if options["skip_eager"] else [("eager", True)])
+        for label, eager in modes:
+            setups, loads = [], []
+            for _ in range(options["runs"]):
+                result = self.probe(eager)
+                setups.append(result["setup"])
+                if result["classifier_load"] is not None:
+                    loads.append(result["setup"] + result["classifier_load"])
+
+            line = f"{label}: django.setup() median {statistics.median(setups):.3f}s"
+            if loads:
+                # What every process paid before the model was loaded lazily
+                line += f", setup + model load median {statistics.median(loads):.3f}s"
+            self.stdout.write(line)
+
+    def probe(self, eager):
+        code = PROBE.format(settings_module=settings.SETTINGS_MODULE, eager=eager)
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=settings.BASE_DIR,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
@@ -0,0 +1,89 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from app.ann import IVFIndex
+from app.features import feature_store
+from app.models import UserProfile
+from app.profiles import decode_weights
+from app.ranking import top_n
+
+
+class Command(BaseCommand):
+    help = "Build the approximate nearest-neighbour index over restaurant features"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            type=str,
+            help="Where to save the index (.npz), see RECOMMENDER_ANN_INDEX.",
+        )
+        parser.add_argument("--lists", type=int, help="Number of inverted lists.")
+        parser.add_argument(
+            "--probe", type=int, default=8, help="Number of lists probed per query."
+        )
+        parser.add_argument(
+            "--evaluate",
+            type=int,
+            default=0,
+            help="Benchmark recall against the exact scorer on this many queries.",
+        )
+        parser.add_argument(
+            "--k", type=int, default=50, help="Top-k for the benchmark."
+        )
+
+    def handle(self, *args, **options):
+        snapshot = feature_store.snapshot()
+
+        start = time.perf_counter()
+        index = IVFIndex(n_lists=options["lists"], n_probe=options["probe"]).build(
+            snapshot
+        )
+        self.stdout.write(
+            f"Built index over {len(snapshot)} restaurants with "
+            f"{len(index.centroids)} lists in {time.perf_counter() - start:.1f}s."
+        )
+
+        if options["evaluate"]:
+            self.evaluate(index, snapshot, options["evaluate"], options["k"])
+
+        if options["output"]:
+            index.save(options["output"])
+            self.stdout.write(
+                self.style.SUCCESS(f"Index saved to {options['output']}.")
+            )
+
+    def evaluate(self, index, snapshot, n_queries, k):
+        # Use real user profiles as queries, topped up with random ones
+        queries = [
+            decode_weights(weights)
+            for weights in UserProfile.objects.filter(layout=snapshot.layout)
+            .exclude(weights=b"")
+            .values_list("weights", flat=True)[:n_queries]
+        ]
+        rng = np.random.default_rng(0)
+        while len(queries) < n_queries:
+            queries.append(rng.normal(size=snapshot.matrix.shape[1]))
+
+        recalls, ann_times, exact_times = [], [], []
+        for weights in queries:
+            query = np.asarray(weights, dtype=np.float32)
+            query = query / (np.sum(query) or 1.0)
+
+            start = time.perf_counter()
+            exact = top_n(snapshot.matrix @ query, k)
+            exact_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            approx, _ = index.search(query, k)
+            ann_times.append(time.perf_counter() - start)
+
+            recalls.append(len(np.intersect1d(exact, approx)) / max(len(exact), 1))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"recall@{k}: {np.mean(recalls):.3f} over {len(queries)} queries, "
+                f"ANN {1000 * np.median(ann_times):.2f}ms vs "
+                f"exact {1000 * np.median(exact_times):.2f}ms (median)"
+            )
+        )
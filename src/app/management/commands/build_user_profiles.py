@@ -0,0 +1,90 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from app.features import feature_store
+from app.models import Review, UserProfile
+from app.profiles import encode_weights
+from tqdm import tqdm
+
+
+class Command(BaseCommand):
+    help = "Rebuild the recommender profiles of all users from the Review table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of profiles written per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        start = time.perf_counter()
+        snapshot = feature_store.snapshot()
+        n_features = snapshot.matrix.shape[1]
+
+        reviews = (
+            Review.objects.order_by("user_id")
+            .values_list("user_id", "business_id", "rating")
+            .iterator(chunk_size=batch_size)
+        )
+
+        profiles = []
+        written = 0
+        current_user = None
+        weights = np.zeros(n_features, dtype=np.float32)
+        seen = False
+
+        def flush():
+            nonlocal profiles, written
+            with transaction.atomic():
+                UserProfile.objects.bulk_create(
+                    profiles,
+                    update_conflicts=True,
+                    unique_fields=["user"],
+                    update_fields=["weights", "layout", "updated_at"],
+                )
+            written += len(profiles)
+            profiles = []
+
+        for user_pk, business_pk, rating in tqdm(reviews):
+            if user_pk != current_user:
+                if current_user is not None:
+                    profiles.append(
+                        UserProfile(
+                            user_id=current_user,
+                            weights=encode_weights(weights if seen else None),
+                            layout=snapshot.layout,
+                        )
+                    )
+                    if len(profiles) >= batch_size:
+                        flush()
+                current_user = user_pk
+                weights = np.zeros(n_features, dtype=np.float32)
+                seen = False
+
+            rows, _ = snapshot.lookup([business_pk])
+            if len(rows):
+                weights += rating * snapshot.matrix[rows[0]]
+                seen = True
+
+        if current_user is not None:
+            profiles.append(
+                UserProfile(
+                    user_id=current_user,
+                    weights=encode_weights(weights if seen else None),
+                    layout=snapshot.layout,
+                )
+            )
+        if profiles:
+            flush()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully built {written} user profiles in {elapsed:.1f}s."
+            )
+        )
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from app.models import Restaurant, Review
+from app.pagination import rating_page
+from app.search import filter_restaurants
+
+# Representative searches of views.home: each filter is explained as the first
+# page of the rating-ordered listing and as the recommender's candidate scan
+FILTERS = {
+    "no filters": Q(),
+    "min rating": Q(rating__gte=4),
+    "price range": Q(price_range=2),
+    "price range + min rating": Q(price_range=2, rating__gte=4),
+    "delivery": Q(delivery=True),
+    "take out": Q(take_out=True),
+    "delivery + take out": Q(delivery=True, take_out=True),
+    "good for kids": Q(good_for_kids=True),
+    "good for groups + outdoor seating": Q(good_for_groups=True, outdoor_seating=True),
+    "cuisine": Q(cuisines__id=1),
+    "cuisine + delivery": Q(cuisines__id=1, delivery=True),
+}
+
+# Name and city searches, narrowed by the full-text index on SQLite as in
+# views.home (app/search.py): (column, term, other filters)
+SEARCHES = {
+    "city": ("city", "Philadelphia", Q()),
+    "city + min rating": ("city", "Philadelphia", Q(rating__gte=4)),
+    "name": ("name", "pizza", Q()),
+}
+
+
+def searches():
+    for label, condition in FILTERS.items():
+        yield label, Restaurant.objects.filter(condition)
+    for label, (column, term, condition) in SEARCHES.items():
+        restaurants = Restaurant.objects.filter(condition)
+        yield label, filter_restaurants(restaurants, column, term)
+
+
+def catalogue(page_size):
+    for label, restaurants in searches():
+        yield f"{label} (listing)", rating_page(restaurants, page_size + 1)
+        yield f"{label} (candidates)", restaurants.values_list("pk", flat=True)
+
+    # Lookups of the recommender and its profiles
+    yield "reviews of a user", Review.objects.filter(user_id=1).values_list(
+        "business_id", "rating"
+    )
+    yield "reviews ordered by user", Review.objects.order_by("user_id").values_list(
+        "user_id", "business_id", "rating"
+    )
+
+
+class Command(BaseCommand):
+    help = "Print the query plans of representative restaurant searches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only",
+            type=str,
+            help="Only explain queries whose label contains this text.",
+        )
+        parser.add_argument("--page-size", type=int, default=50)
+
+    def handle(self, *args, **options):
+        explained = 0
+        for label, queryset in catalogue(options["page_size"]):
+            if options["only"] and options["only"] not in label:
+                continue
+            self.stdout.write(self.style.SUCCESS(label))
+            # EXPLAIN QUERY PLAN on SQLite, EXPLAIN on PostgreSQL
+            self.stdout.write(queryset.explain())
+            self.stdout.write("")
+            explained += 1
+
+        if not explained:
+            raise CommandError(f"No query matches {options['only']!r}.")
@@ -0,0 +1,180 @@
+import inspect
+import json
+import os
+import time
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from app.classifier import (
+    MODEL_NAME,
+    RUNTIME_CONFIG,
+    ReviewClassifier,
+    forward_order,
+    suppress_framework_logging,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the fake-review classifier as a dynamically int8-quantized CPU model "
+        "(ONNX or TorchScript), for REVIEW_CLASSIFIER_ARTIFACT"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", type=str, help="Directory to write the model to.")
+        parser.add_argument("--format", choices=["onnx", "torchscript"], default="onnx")
+        parser.add_argument(
+            "--max-length",
+            type=int,
+            default=512,
+            help="Sequence length TorchScript models are traced with.",
+        )
+        parser.add_argument(
+            "--check-parity",
+            type=str,
+            metavar="CSV",
+            help="Compare the exported model with the original on reviews from this CSV.",
+        )
+        parser.add_argument("--sample", type=int, default=1000)
+        parser.add_argument(
+            "--min-agreement",
+            type=float,
+            default=0.99,
+            help="Fail the parity check below this share of identical predictions.",
+        )
+        parser.add_argument("--batch-size", type=int, default=32)
+
+    def handle(self, *args, **options):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        suppress_framework_logging()
+        output = options["output"]
+        os.makedirs(output, exist_ok=True)
+
+        tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        # torchscript=True makes the model return tuples, which tracing requires
+        model = AutoModelForSequenceClassification.from_pretrained(
+            MODEL_NAME, from_tf=True, torchscript=True
+        )
+        model.eval()
+
+        example = tokenizer(
+            ["An example review."],
+            return_tensors="pt",
+            padding="max_length",
+            truncation=True,
+            max_length=options["max_length"],
+        )
+        # Traced and exported graphs take their inputs positionally, in the
+        # order of the model's forward arguments
+        input_names = forward_order(
+            inspect.signature(model.forward).parameters,
+            [name for name in tokenizer.model_input_names if name in example],
+        )
+        inputs = tuple(example[name] for name in input_names)
+
+        if options["format"] == "onnx":
+            self.export_onnx(model, inputs, input_names, output)
+        else:
+            quantized = torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+            with torch.no_grad():
+                traced = torch.jit.trace(quantized, inputs, strict=False)
+            torch.jit.save(traced, os.path.join(output, "model.pt"))
+
+        tokenizer.save_pretrained(output)
+        with open(os.path.join(output, RUNTIME_CONFIG), "w") as file:
+            json.dump(
+                {
+                    "format": options["format"],
+                    "model_name": MODEL_NAME,
+                    "input_names": input_names,
+                    "max_length": options["max_length"],
+                },
+                file,
+                indent=2,
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Exported {options['format']} model to {output}.")
+        )
+
+        if options["check_parity"]:
+            self.check_parity(
+                options["check_parity"],
+                output,
+                options["sample"],
+                options["batch_size"],
+                options["min_agreement"],
+            )
+
+    def export_onnx(self, model, inputs, input_names, output):
+        import torch
+
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+        except ImportError:
+            raise CommandError(
+                "ONNX export requires the onnx and onnxruntime packages."
+            )
+
+        # Export full precision, then quantize the weights of the exported graph
+        full_precision = os.path.join(output, "model-fp32.onnx")
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["logits"] = {0: "batch"}
+        torch.onnx.export(
+            model,
+            inputs,
+            full_precision,
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+        )
+        quantize_dynamic(
+            full_precision,
+            os.path.join(output, "model.onnx"),
+            weight_type=QuantType.QInt8,
+        )
+        os.remove(full_precision)
+
+    def check_parity(self, csv_file, artifact, sample, batch_size, min_agreement):
+        """
+        Prediction agreement and per-review latency of both models on a sample.
+        Raises CommandError if they agree on less than `min_agreement` of it.
+        """
+        texts = (
+            pd.read_csv(csv_file, usecols=["text"], nrows=sample)["text"]
+            .fillna("")
+            .astype(str)
+            .tolist()
+        )
+        results = {}
+        for label, model in [
+            ("original", ReviewClassifier()),
+            ("exported", ReviewClassifier(artifact=artifact)),
+        ]:
+            model.load()
+            predictions = []
+            start = time.perf_counter()
+            for i in range(0, len(texts), batch_size):
+                predictions.extend(model.predict(texts[i : i + batch_size]))
+            elapsed = time.perf_counter() - start
+            results[label] = predictions
+            self.stdout.write(
+                f"{label}: {elapsed / max(len(texts), 1) * 1000:.2f} ms/review, "
+                f"{sum(predictions)} of {len(texts)} flagged as fake"
+            )
+
+        agreement = sum(
+            a == b for a, b in zip(results["original"], results["exported"])
+        ) / max(len(texts), 1)
+        message = (
+            f"Exported model agrees with the original on {agreement:.2%} "
+            f"of {len(texts)} reviews."
+        )
+        if agreement < min_agreement:
+            raise CommandError(f"{message} At least {min_agreement:.2%} is required.")
+        self.stdout.write(self.style.SUCCESS(message))
@@ -1,374 +1,406 @@
-import csv
 from datetime import datetime
+from functools import lru_cache
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from app.ingest import ingest
 from app.models import Restaurant, Cuisine, Ambience
-from tqdm import tqdm
+from app.search import rebuild_index
+from app.stores import catalog_version
 
+# Cuisines and ambiences come as one 0/1 column per category
+CUISINE_COLUMNS = [
+    "Bakeries",
+    "Gelato",
+    "Guamanian",
+    "Buffets",
+    "Juice Bars & Smoothies",
+    "Burmese",
+    "Australian",
+    "Kombucha",
+    "Fish & Chips",
+    "Szechuan",
+    "Venezuelan",
+    "Indonesian",
+    "Thai",
+    "Waffles",
+    "Singaporean",
+    "Coffeeshops",
+    "Sushi Bars",
+    "Persian/Iranian",
+    "Syrian",
+    "Pakistani",
+    "Chinese",
+    "Cupcakes",
+    "Hot Dogs",
+    "Tea Rooms",
+    "Korean",
+    "Patisserie/Cake Shop",
+    "Pasta Shops",
+    "Salvadoran",
+    "Japanese Curry",
+    "Halal",
+    "Greek",
+    "Pan Asian",
+    "Beer Hall",
+    "Poutineries",
+    "Pizza",
+    "Senegalese",
+    "Vegetarian",
+    "African",
+    "Turkish",
+    "Hot Pot",
+    "Hawaiian",
+    "Irish",
+    "Soul Food",
+    "Puerto Rican",
+    "Macarons",
+    "Israeli",
+    "Diners",
+    "Cajun/Creole",
+    "Tex-Mex",
+    "Creperies",
+    "Wraps",
+    "Austrian",
+    "Beer Bar",
+    "Wine & Spirits",
+    "Moroccan",
+    "Ukrainian",
+    "American (Traditional)",
+    "Belgian",
+    "Malaysian",
+    "Ethnic Food",
+    "Tacos",
+    "Kosher",
+    "Bangladeshi",
+    "Himalayan/Nepalese",
+    "Mongolian",
+    "Canadian (New)",
+    "Izakaya",
+    "French",
+    "Cuban",
+    "Filipino",
+    "Caterers",
+    "Brazilian",
+    "Spanish",
+    "Wineries",
+    "Parent Cafes",
+    "Asian Fusion",
+    "Delis",
+    "Hong Kong Style Cafe",
+    "Acai Bowls",
+    "Brewpubs",
+    "Tuscan",
+    "Indian",
+    "Burgers",
+    "Brasseries",
+    "British",
+    "Hungarian",
+    "German",
+    "Cafes",
+    "Chocolatiers & Shops",
+    "Bubble Tea",
+    "Beer Gardens",
+    "Coffee Roasteries",
+    "Peruvian",
+    "Tapas Bars",
+    "Sardinian",
+    "Barbeque",
+    "Poke",
+    "Scandinavian",
+    "Egyptian",
+    "South African",
+    "Portuguese",
+    "Food Trucks",
+    "Pita",
+    "Donburi",
+    "Bagels",
+    "Russian",
+    "Southern",
+    "Mediterranean",
+    "Organic Stores",
+    "Health Markets",
+    "Shanghainese",
+    "Local Flavor",
+    "Conveyor Belt Sushi",
+    "Fuzhou",
+    "Noodles",
+    "Latin American",
+    "Scottish",
+    "Irish Pub",
+    "Taiwanese",
+    "Empanadas",
+    "Gluten-Free",
+    "Middle Eastern",
+    "Pancakes",
+    "Cocktail Bars",
+    "Breakfast & Brunch",
+    "Nicaraguan",
+    "Italian",
+    "Tonkatsu",
+    "Themed Cafes",
+    "Ethical Grocery",
+    "Food Stands",
+    "Laotian",
+    "Serbo Croatian",
+    "Desserts",
+    "Iberian",
+    "Lebanese",
+    "Food",
+    "Sicilian",
+    "Fruits & Veggies",
+    "Live/Raw Food",
+    "Hakka",
+    "Bistros",
+    "Food Court",
+    "Custom Cakes",
+    "Falafel",
+    "Dim Sum",
+    "Czech",
+    "Cafeteria",
+    "Dominican",
+    "Cheesesteaks",
+    "Caribbean",
+    "Modern European",
+    "Cambodian",
+    "Kebab",
+    "Arabic",
+    "American (New)",
+    "Pop-Up Restaurants",
+    "Ethnic Grocery",
+    "Oriental",
+    "Georgian",
+    "Coffee & Tea",
+    "Soup",
+    "Argentine",
+    "Colombian",
+    "Comfort Food",
+    "International",
+    "New Mexican Cuisine",
+    "Ramen",
+    "Uzbek",
+    "Dumplings",
+    "Salad",
+    "Do-It-Yourself Food",
+    "Honduran",
+    "Cucina campana",
+    "Fondue",
+    "Seafood",
+    "Basque",
+    "Mexican",
+    "Haitian",
+    "Beer",
+    "Sandwiches",
+    "Pretzels",
+    "Hainan",
+    "Eastern European",
+    "Polish",
+    "Ethiopian",
+    "Wine Bars",
+    "Cideries",
+    "Japanese",
+    "Trinidadian",
+    "Steakhouses",
+    "Vietnamese",
+    "Ice Cream & Frozen Yogurt",
+    "Sri Lankan",
+    "Specialty Food",
+    "Cantonese",
+    "Breweries",
+    "Vegan",
+    "Calabrian",
+    "Donuts",
+    "Chicken Wings",
+]
+AMBIENCE_COLUMNS = [
+    "divey",
+    "upscale",
+    "touristy",
+    "intimate",
+    "casual",
+    "trendy",
+    "classy",
+    "hipster",
+    "romantic",
+]
 
-class Command(BaseCommand):
-    help = "Load restaurant data from a CSV file into the Restaurant model"
+CUISINE_SET = frozenset(CUISINE_COLUMNS)
+AMBIENCE_SET = frozenset(AMBIENCE_COLUMNS)
 
-    def add_arguments(self, parser):
-        parser.add_argument(
-            "csv_file",
-            type=str,
-            help="The path to the CSV file containing restaurant data.",
-        )
+# Define sustainable categories
+SUSTAINABLE_CUISINES = [
+    "Vegan",
+    "Vegetarian",
+    "Organic Stores",
+    "Ethical Grocery",
+    "Local Flavor",
+    "Ethnic Grocery",
+]
 
-    def handle(self, *args, **options):
-        file_path = options["csv_file"]
 
+def parse_boolean(value):
+    return value == "1"
+
+
+def parse_time(time_str):
+    if time_str:
         try:
-            with open(file_path, mode="r", encoding="utf-8") as file:
-                reader = csv.DictReader(file)
-                restaurants_to_create = []
+            return datetime.strptime(time_str, "%H:%M:%S").time()
+        except ValueError:
+            return None
+    return None
 
-                for row in tqdm(reader):
-                    # ignore closed restaurants (permanently)
-                    if row.get("is_open") != "1":
-                        continue
 
-                    # Helper function to parse boolean fields
-                    def parse_boolean(value):
-                        return value == "1"
+@lru_cache(maxsize=8)
+def category_columns(fieldnames):
+    """
+    CSV columns holding cuisine and ambience flags, computed once per header.
+    """
+    return (
+        [name for name in fieldnames if name.strip() in CUISINE_SET],
+        [name for name in fieldnames if name.strip() in AMBIENCE_SET],
+    )
 
-                    # Parse cuisines and ambiences (comma-separated values)
-                    cuisine_cols = [
-                        "Bakeries",
-                        "Gelato",
-                        "Guamanian",
-                        "Buffets",
-                        "Juice Bars & Smoothies",
-                        "Burmese",
-                        "Australian",
-                        "Kombucha",
-                        "Fish & Chips",
-                        "Szechuan",
-                        "Venezuelan",
-                        "Indonesian",
-                        "Thai",
-                        "Waffles",
-                        "Singaporean",
-                        "Coffeeshops",
-                        "Sushi Bars",
-                        "Persian/Iranian",
-                        "Syrian",
-                        "Pakistani",
-                        "Chinese",
-                        "Cupcakes",
-                        "Hot Dogs",
-                        "Tea Rooms",
-                        "Korean",
-                        "Patisserie/Cake Shop",
-                        "Pasta Shops",
-                        "Salvadoran",
-                        "Japanese Curry",
-                        "Halal",
-                        "Greek",
-                        "Pan Asian",
-                        "Beer Hall",
-                        "Poutineries",
-                        "Pizza",
-                        "Senegalese",
-                        "Vegetarian",
-                        "African",
-                        "Turkish",
-                        "Hot Pot",
-                        "Hawaiian",
-                        "Irish",
-                        "Soul Food",
-                        "Puerto Rican",
-                        "Macarons",
-                        "Israeli",
-                        "Diners",
-                        "Cajun/Creole",
-                        "Tex-Mex",
-                        "Creperies",
-                        "Wraps",
-                        "Austrian",
-                        "Beer Bar",
-                        "Wine & Spirits",
-                        "Moroccan",
-                        "Ukrainian",
-                        "American (Traditional)",
-                        "Belgian",
-                        "Malaysian",
-                        "Ethnic Food",
-                        "Tacos",
-                        "Kosher",
-                        "Bangladeshi",
-                        "Himalayan/Nepalese",
-                        "Mongolian",
-                        "Canadian (New)",
-                        "Izakaya",
-                        "French",
-                        "Cuban",
-                        "Filipino",
-                        "Caterers",
-                        "Brazilian",
-                        "Spanish",
-                        "Wineries",
-                        "Parent Cafes",
-                        "Asian Fusion",
-                        "Delis",
-                        "Hong Kong Style Cafe",
-                        "Acai Bowls",
-                        "Brewpubs",
-                        "Tuscan",
-                        "Indian",
-                        "Burgers",
-                        "Brasseries",
-                        "British",
-                        "Hungarian",
-                        "German",
-                        "Cafes",
-                        "Chocolatiers & Shops",
-                        "Bubble Tea",
-                        "Beer Gardens",
-                        "Coffee Roasteries",
-                        "Peruvian",
-                        "Tapas Bars",
-                        "Sardinian",
-                        "Barbeque",
-                        "Poke",
-                        "Scandinavian",
-                        "Egyptian",
-                        "South African",
-                        "Portuguese",
-                        "Food Trucks",
-                        "Pita",
-                        "Donburi",
-                        "Bagels",
-                        "Russian",
-                        "Southern",
-                        "Mediterranean",
-                        "Organic Stores",
-                        "Health Markets",
-                        "Shanghainese",
-                        "Local Flavor",
-                        "Conveyor Belt Sushi",
-                        "Fuzhou",
-                        "Noodles",
-                        "Latin American",
-                        "Scottish",
-                        "Irish Pub",
-                        "Taiwanese",
-                        "Empanadas",
-                        "Gluten-Free",
-                        "Middle Eastern",
-                        "Pancakes",
-                        "Cocktail Bars",
-                        "Breakfast & Brunch",
-                        "Nicaraguan",
-                        "Italian",
-                        "Tonkatsu",
-                        "Themed Cafes",
-                        "Ethical Grocery",
-                        "Food Stands",
-                        "Laotian",
-                        "Serbo Croatian",
-                        "Desserts",
-                        "Iberian",
-                        "Lebanese",
-                        "Food",
-                        "Sicilian",
-                        "Fruits & Veggies",
-                        "Live/Raw Food",
-                        "Hakka",
-                        "Bistros",
-                        "Food Court",
-                        "Custom Cakes",
-                        "Falafel",
-                        "Dim Sum",
-                        "Czech",
-                        "Cafeteria",
-                        "Dominican",
-                        "Cheesesteaks",
-                        "Caribbean",
-                        "Modern European",
-                        "Cambodian",
-                        "Kebab",
-                        "Arabic",
-                        "American (New)",
-                        "Pop-Up Restaurants",
-                        "Ethnic Grocery",
-                        "Oriental",
-                        "Georgian",
-                        "Coffee & Tea",
-                        "Soup",
-                        "Argentine",
-                        "Colombian",
-                        "Comfort Food",
-                        "International",
-                        "New Mexican Cuisine",
-                        "Ramen",
-                        "Uzbek",
-                        "Dumplings",
-                        "Salad",
-                        "Do-It-Yourself Food",
-                        "Honduran",
-                        "Cucina campana",
-                        "Fondue",
-                        "Seafood",
-                        "Basque",
-                        "Mexican",
-                        "Haitian",
-                        "Beer",
-                        "Sandwiches",
-                        "Pretzels",
-                        "Hainan",
-                        "Eastern European",
-                        "Polish",
-                        "Ethiopian",
-                        "Wine Bars",
-                        "Cideries",
-                        "Japanese",
-                        "Trinidadian",
-                        "Steakhouses",
-                        "Vietnamese",
-                        "Ice Cream & Frozen Yogurt",
-                        "Sri Lankan",
-                        "Specialty Food",
-                        "Cantonese",
-                        "Breweries",
-                        "Vegan",
-                        "Calabrian",
-                        "Donuts",
-                        "Chicken Wings",
-                    ]
-                    ambience_cols = [
-                        "divey",
-                        "upscale",
-                        "touristy",
-                        "intimate",
-                        "casual",
-                        "trendy",
-                        "classy",
-                        "hipster",
-                        "romantic",
-                    ]
 
-                    cuisines = [
-                        name.strip()
-                        for name in row.keys()
-                        if name.strip() in cuisine_cols and row.get(name) == "1"
-                    ]
+def parse_restaurant(row):
+    """
+    Convert a CSV row into Restaurant field values, cuisine names and ambience names.
+    Returns None for restaurants that are closed permanently.
+    """
+    if row.get("is_open") != "1":
+        return None
 
-                    ambiences = [
-                        name.strip()
-                        for name in row.keys()
-                        if name.strip() in ambience_cols and row.get(name) == "1"
-                    ]
+    cuisine_columns, ambience_columns = category_columns(tuple(row.keys()))
+    cuisines = [name.strip() for name in cuisine_columns if row[name] == "1"]
+    ambiences = [name.strip() for name in ambience_columns if row[name] == "1"]
 
-                    # Define sustainable categories
-                    sustainable_cuisines = [
-                        "Vegan",
-                        "Vegetarian",
-                        "Organic Stores",
-                        "Ethical Grocery",
-                        "Local Flavor",
-                        "Ethnic Grocery",
-                    ]
+    fields = dict(
+        business_id=row["business_id"],
+        name=row["name"],
+        address=row["address"],
+        city=row["city"],
+        state=row["state"],
+        postal_code=row.get("postal_code"),
+        latitude=(float(row["latitude"]) if row.get("latitude") else None),
+        longitude=(float(row["longitude"]) if row.get("longitude") else None),
+        review_count=int(row["review_count"]),
+        rating=float(row["stars"]),
+        good_for_kids=parse_boolean(row.get("attributes.GoodForKids")),
+        good_for_groups=parse_boolean(row.get("attributes.RestaurantsGoodForGroups")),
+        take_out=parse_boolean(row.get("attributes.RestaurantsTakeOut")),
+        reservations=parse_boolean(row.get("attributes.RestaurantsReservations")),
+        delivery=parse_boolean(row.get("attributes.RestaurantsDelivery")),
+        outdoor_seating=parse_boolean(row.get("attributes.OutdoorSeating")),
+        wheelchair_accessible=parse_boolean(row.get("attributes.WheelchairAccessible")),
+        bike_parking=parse_boolean(row.get("attributes.BikeParking")),
+        credit_cards_accepted=parse_boolean(
+            row.get("attributes.BusinessAcceptsCreditCards")
+        ),
+        price_range=(
+            int(row["attributes.RestaurantsPriceRange2"])
+            if row.get("attributes.RestaurantsPriceRange2")
+            else None
+        ),
+        alcohol=parse_boolean(row.get("attributes.Alcohol")),
+        happy_hour=parse_boolean(row.get("attributes.HappyHour")),
+        dogs_allowed=parse_boolean(row.get("attributes.DogsAllowed")),
+        sustainable=any(cuisine in SUSTAINABLE_CUISINES for cuisine in cuisines),
+        parking=parse_boolean(row.get("attributes.BusinessParking")),
+        monday_open=parse_time(row.get("hours.Monday_open_time")),
+        monday_close=parse_time(row.get("hours.Monday_close_time")),
+        tuesday_open=parse_time(row.get("hours.Tuesday_open_time")),
+        tuesday_close=parse_time(row.get("hours.Tuesday_close_time")),
+        wednesday_open=parse_time(row.get("hours.Wednesday_open_time")),
+        wednesday_close=parse_time(row.get("hours.Wednesday_close_time")),
+        thursday_open=parse_time(row.get("hours.Thursday_open_time")),
+        thursday_close=parse_time(row.get("hours.Thursday_close_time")),
+        friday_open=parse_time(row.get("hours.Friday_open_time")),
+        friday_close=parse_time(row.get("hours.Friday_close_time")),
+        saturday_open=parse_time(row.get("hours.Saturday_open_time")),
+        saturday_close=parse_time(row.get("hours.Saturday_close_time")),
+        sunday_open=parse_time(row.get("hours.Sunday_open_time")),
+        sunday_close=parse_time(row.get("hours.Sunday_close_time")),
+    )
+    return fields, cuisines, ambiences
 
-                    # Parse time fields
-                    def parse_time(time_str):
-                        if time_str:
-                            try:
-                                return datetime.strptime(time_str, "%H:%M:%S").time()
-                            except ValueError:
-                                return None
-                        return None
 
-                    restaurant = Restaurant(
-                        business_id=row["business_id"],
-                        name=row["name"],
-                        address=row["address"],
-                        city=row["city"],
-                        state=row["state"],
-                        postal_code=row.get("postal_code"),
-                        latitude=(
-                            float(row["latitude"]) if row.get("latitude") else None
-                        ),
-                        longitude=(
-                            float(row["longitude"]) if row.get("longitude") else None
-                        ),
-                        review_count=int(row["review_count"]),
-                        rating=float(row["stars"]),
-                        good_for_kids=parse_boolean(row.get("attributes.GoodForKids")),
-                        good_for_groups=parse_boolean(
-                            row.get("attributes.RestaurantsGoodForGroups")
-                        ),
-                        take_out=parse_boolean(
-                            row.get("attributes.RestaurantsTakeOut")
-                        ),
-                        reservations=parse_boolean(
-                            row.get("attributes.RestaurantsReservations")
-                        ),
-                        delivery=parse_boolean(
-                            row.get("attributes.RestaurantsDelivery")
-                        ),
-                        outdoor_seating=parse_boolean(
-                            row.get("attributes.OutdoorSeating")
-                        ),
-                        wheelchair_accessible=parse_boolean(
-                            row.get("attributes.WheelchairAccessible")
-                        ),
-                        bike_parking=parse_boolean(row.get("attributes.BikeParking")),
-                        credit_cards_accepted=parse_boolean(
-                            row.get("attributes.BusinessAcceptsCreditCards")
-                        ),
-                        price_range=(
-                            int(row["attributes.RestaurantsPriceRange2"])
-                            if row.get("attributes.RestaurantsPriceRange2")
-                            else None
-                        ),
-                        alcohol=parse_boolean(row.get("attributes.Alcohol")),
-                        happy_hour=parse_boolean(row.get("attributes.HappyHour")),
-                        dogs_allowed=parse_boolean(row.get("attributes.DogsAllowed")),
-                        sustainable=any(
-                            cuisine in sustainable_cuisines for cuisine in cuisines
-                        ),
-                        parking=parse_boolean(row.get("attributes.BusinessParking")),
-                        monday_open=parse_time(row.get("hours.Monday_open_time")),
-                        monday_close=parse_time(row.get("hours.Monday_close_time")),
-                        tuesday_open=parse_time(row.get("hours.Tuesday_open_time")),
-                        tuesday_close=parse_time(row.get("hours.Tuesday_close_time")),
-                        wednesday_open=parse_time(row.get("hours.Wednesday_open_time")),
-                        wednesday_close=parse_time(
-                            row.get("hours.Wednesday_close_time")
-                        ),
-                        thursday_open=parse_time(row.get("hours.Thursday_open_time")),
-                        thursday_close=parse_time(row.get("hours.Thursday_close_time")),
-                        friday_open=parse_time(row.get("hours.Friday_open_time")),
-                        friday_close=parse_time(row.get("hours.Friday_close_time")),
-                        saturday_open=parse_time(row.get("hours.Saturday_open_time")),
-                        saturday_close=parse_time(row.get("hours.Saturday_close_time")),
-                        sunday_open=parse_time(row.get("hours.Sunday_open_time")),
-                        sunday_close=parse_time(row.get("hours.Sunday_close_time")),
-                    )
-                    restaurant.save()
+class CategoryIds:
+    """
+    In-memory name -> id map of Cuisine or Ambience rows.
+    Missing categories are created in bulk the first time they are seen.
+    """
 
-                    # Add many-to-many relationships
-                    for cuisine_name in cuisines:
-                        cuisine_obj, _ = Cuisine.objects.get_or_create(
-                            name=cuisine_name
-                        )
-                        restaurant.cuisines.add(cuisine_obj)
+    def __init__(self, model):
+        self.model = model
+        self.ids = dict(model.objects.values_list("name", "id"))
 
-                    # Add or fetch ambience instances
-                    for ambience_name in ambiences:
-                        ambience_obj, _ = Ambience.objects.get_or_create(
-                            name=ambience_name
-                        )
-                        restaurant.ambiences.add(ambience_obj)
+    def __getitem__(self, name):
+        return self.ids[name]
 
-                    restaurants_to_create.append(restaurant)
+    def ensure(self, names):
+        missing = set(names) - self.ids.keys()
+        if missing:
+            self.model.objects.bulk_create(
+                [self.model(name=name) for name in missing], ignore_conflicts=True
+            )
+            self.ids.update(
+                self.model.objects.filter(name__in=missing).values_list("name", "id")
+            )
 
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"Successfully loaded {len(restaurants_to_create)} restaurants."
-                    )
+
+class Command(BaseCommand):
+    help = "Load restaurant data from a CSV file into the Restaurant model"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "csv_file",
+            type=str,
+            help="The path to the CSV file containing restaurant data.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Number of restaurants inserted per transaction.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of parser processes, e.g. the number of CPUs.",
+        )
+
+    def handle(self, *args, **options):
+        file_path = options["csv_file"]
+
+        try:
+            self.cuisine_ids = CategoryIds(Cuisine)
+            self.ambience_ids = CategoryIds(Ambience)
+            # Skip restaurants loaded by a previous run
+            self.existing = set(
+                Restaurant.objects.values_list("business_id", flat=True).iterator()
+            )
+
+            stats = ingest(
+                file_path,
+                parse_restaurant,
+                self.save_batch,
+                workers=options["workers"],
+                batch_size=options["batch_size"],
+            )
+            # bulk_create skips the save signals keeping the search index and the
+            # in-memory indexes of running workers in sync
+            rebuild_index()
+            catalog_version.bump()
+            if stats.errors:
+                self.stderr.write(
+                    self.style.WARNING(f"Skipped {stats.errors} malformed rows.")
+                )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Successfully loaded {stats.written} restaurants from "
+                    f"{stats.rows} rows in {stats.elapsed:.1f}s ({stats.rate:.0f} rows/s)."
                 )
+            )
 
         except FileNotFoundError:
             self.stderr.write(self.style.ERROR(f"File not found: {file_path}"))
@@ -378,3 +410,46 @@ class Command(BaseCommand):
             )
         except Exception as e:
             self.stderr.write(self.style.ERROR(f"An error occurred: {str(e)}"))
+
+    def save_batch(self, batch, resume_offset):
+        """
+        Insert restaurants and their cuisine/ambience links with a few bulk queries.
+        """
+        CuisineLink = Restaurant.cuisines.through
+        AmbienceLink = Restaurant.ambiences.through
+
+        batch = [row for row in batch if row[0]["business_id"] not in self.existing]
+        self.existing.update(fields["business_id"] for fields, _, _ in batch)
+
+        with transaction.atomic():
+            self.cuisine_ids.ensure(
+                name for _, cuisines, _ in batch for name in cuisines
+            )
+            self.ambience_ids.ensure(
+                name for _, _, ambiences in batch for name in ambiences
+            )
+
+            # Primary keys are set on the instances by bulk_create
+            restaurants = Restaurant.objects.bulk_create(
+                [Restaurant(**fields) for fields, _, _ in batch]
+            )
+
+            CuisineLink.objects.bulk_create(
+                [
+                    CuisineLink(
+                        restaurant_id=restaurant.pk, cuisine_id=self.cuisine_ids[name]
+                    )
+                    for restaurant, (_, cuisines, _) in zip(restaurants, batch)
+                    for name in cuisines
+                ]
+            )
+            AmbienceLink.objects.bulk_create(
+                [
+                    AmbienceLink(
+                        restaurant_id=restaurant.pk, ambience_id=self.ambience_ids[name]
+                    )
+                    for restaurant, (_, _, ambiences) in zip(restaurants, batch)
+                    for name in ambiences
+                ]
+            )
+        return len(restaurants)
@@ -1,8 +1,38 @@
-import csv
 from datetime import datetime
 from django.core.management.base import BaseCommand
-from app.models import Review, User, Restaurant
-from tqdm import tqdm
+from django.db import transaction
+from app.ingest import ingest
+from app.models import Review, User, Restaurant, UserProfile
+from app.results import result_cache
+from app.stores import reviews_version
+
+REVIEW_COLUMNS = [
+    "review_id",
+    "user_id",
+    "business_id",
+    "stars",
+    "date",
+    "text",
+    "classification",
+]
+
+
+def parse_review(row):
+    """
+    Convert a CSV row into (review_id, user_id, business_id, rating, date, text).
+    Returns None for reviews classified as fake.
+    """
+    if row["classification"].lower() != "genuine":
+        return None
+
+    return (
+        row["review_id"],
+        row["user_id"],
+        row["business_id"],
+        float(row["stars"]),
+        datetime.strptime(row["date"], "%Y-%m-%d %H:%M:%S").date(),
+        row["text"],
+    )
 
 
 class Command(BaseCommand):
@@ -10,52 +40,102 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("csv_file", type=str, help="The path to the CSV file.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Number of reviews inserted per transaction.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of parser processes, e.g. the number of CPUs.",
+        )
 
     def handle(self, *args, **options):
         csv_file = options["csv_file"]
 
         try:
-            with open(csv_file, newline="", encoding="utf-8") as file:
-                reader = csv.DictReader(file)
-                for row in tqdm(reader):
-                    if row["classification"].lower() == "genuine":
-                        try:
-                            # Retrieve the Restaurant and User instances
-                            try:
-                                restaurant = Restaurant.objects.get(
-                                    business_id=row["business_id"]
-                                )
-                                user = User.objects.get(user_id=row["user_id"])
-                            except Restaurant.DoesNotExist:
-                                self.stderr.write(
-                                    f"Restaurant with business_id {row['business_id']} not found."
-                                )
-                                continue  # Skip this review if the restaurant doesn't exist
-                            except User.DoesNotExist:
-                                self.stderr.write(
-                                    f"User with user_id {row['user_id']} not found."
-                                )
-                                continue  # Skip this review if the user doesn't exist
-
-                            # Create and save the review
-                            review = Review(
-                                review_id=row["review_id"],
-                                user_id=user,  # Assign the User instance
-                                business_id=restaurant,
-                                rating=float(row["stars"]),
-                                date=datetime.strptime(
-                                    row["date"], "%Y-%m-%d %H:%M:%S"
-                                ),
-                                text=row["text"],
-                            )
-                            review.save()
-                            # self.stdout.write(f"Saved review {row['review_id']}")
-
-                        except User.DoesNotExist:
-                            self.stderr.write(
-                                f"User with ID {row['user_id']} not found."
-                            )
+            # business_id -> pk and user_id -> pk, streamed from the database once
+            self.restaurant_ids = dict(
+                Restaurant.objects.values_list("business_id", "pk").iterator(
+                    chunk_size=10000
+                )
+            )
+            self.user_ids = dict(
+                User.objects.values_list("user_id", "pk").iterator(chunk_size=10000)
+            )
+            self.missing_restaurants = 0
+            self.missing_users = 0
+            self.stdout.write(
+                f"Resolved {len(self.restaurant_ids)} restaurants and "
+                f"{len(self.user_ids)} users."
+            )
+
+            # Bulk inserts fire no signals, the caches are refreshed below
+            stats = ingest(
+                csv_file,
+                parse_review,
+                self.save_batch,
+                workers=options["workers"],
+                batch_size=options["batch_size"],
+                usecols=REVIEW_COLUMNS,
+            )
+
+            if self.missing_restaurants or self.missing_users or stats.errors:
+                self.stderr.write(
+                    f"Skipped {self.missing_restaurants} reviews of unknown restaurants, "
+                    f"{self.missing_users} reviews of unknown users and "
+                    f"{stats.errors} malformed rows."
+                )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Successfully processed {stats.written} reviews from "
+                    f"{stats.rows} rows in {stats.elapsed:.1f}s ({stats.rate:.0f} rows/s). "
+                    "Profiles of their authors are rebuilt on next use, or run "
+                    "build_user_profiles to rebuild them now."
+                )
+            )
+
         except FileNotFoundError:
             self.stderr.write(f"File {csv_file} not found.")
         except Exception as e:
             self.stderr.write(str(e))
+        finally:
+            # Batches written before a failure count too. Cached rankings are
+            # missed in every process
+            reviews_version.bump()
+            result_cache.invalidate()
+
+    def save_batch(self, batch, resume_offset):
+        # Foreign keys are resolved in memory, unknown restaurants and users are skipped
+        reviews = []
+        for review_id, user_id, business_id, rating, date, text in batch:
+            restaurant_pk = self.restaurant_ids.get(business_id)
+            if restaurant_pk is None:
+                self.missing_restaurants += 1
+                continue
+            user_pk = self.user_ids.get(user_id)
+            if user_pk is None:
+                self.missing_users += 1
+                continue
+            reviews.append(
+                Review(
+                    review_id=review_id,
+                    user_id_id=user_pk,
+                    business_id_id=restaurant_pk,
+                    rating=rating,
+                    date=date,
+                    text=text,
+                )
+            )
+
+        # Reviews already in the database (same review_id) are skipped. The
+        # profiles of their authors are dropped, to be rebuilt on next use
+        with transaction.atomic():
+            Review.objects.bulk_create(reviews, ignore_conflicts=True)
+            UserProfile.objects.filter(
+                user_id__in={review.user_id_id for review in reviews}
+            ).delete()
+        return len(reviews)
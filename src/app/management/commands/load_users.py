@@ -1,8 +1,24 @@
-import csv
 from datetime import datetime
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from app.ingest import ingest
 from app.models import User
-from tqdm import tqdm
+
+# The only columns read, wide ones (friends, elite, ...) are skipped
+USER_COLUMNS = ["user_id", "name", "review_count", "yelping_since", "average_stars"]
+
+
+def parse_user(row):
+    """
+    Convert a CSV row into (user_id, name, review_count, account_since, average_rating).
+    """
+    return (
+        row["user_id"],
+        row["name"],
+        int(row["review_count"]),
+        datetime.strptime(row["yelping_since"], "%Y-%m-%d %H:%M:%S").date(),
+        float(row["average_stars"]),
+    )
 
 
 class Command(BaseCommand):
@@ -14,50 +30,76 @@ class Command(BaseCommand):
             type=str,
             help="The path to the CSV file containing user data.",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10000,
+            help="Number of users inserted per transaction.",
+        )
+        parser.add_argument(
+            "--start-offset",
+            type=int,
+            default=0,
+            help="Byte offset to resume from, as printed after each committed batch.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of parser processes, e.g. the number of CPUs.",
+        )
 
     def handle(self, *args, **options):
         file_path = options["csv_file"]
-        csv.field_size_limit(10000000)
 
         try:
-            with open(file_path, mode="r", encoding="utf-8") as file:
-                reader = csv.DictReader(file)
-                users_to_create = []
-
-                for row in tqdm(reader):
-                    try:
-                        account_since_date = datetime.strptime(
-                            row["yelping_since"], "%Y-%m-%d %H:%M:%S"
-                        ).date()
-                    except ValueError:
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f"Skipping user with invalid date format: {row['user_id']}"
-                            )
-                        )
-                        continue
-
-                    user = User(
-                        user_id=row["user_id"],
-                        name=row["name"],
-                        review_count=int(row["review_count"]),
-                        account_since=account_since_date,
-                        average_rating=float(row["average_stars"]),
-                    )
-                    users_to_create.append(user)
-
-                User.objects.bulk_create(users_to_create)
+            stats = ingest(
+                file_path,
+                parse_user,
+                self.save_batch,
+                workers=options["workers"],
+                batch_size=options["batch_size"],
+                start_offset=options["start_offset"],
+                usecols=USER_COLUMNS,
+                # The friends column of the Yelp dump holds very long lists: it is
+                # not used, but the csv module still tokenizes it
+                field_size_limit=10000000,
+            )
+            if stats.errors:
                 self.stdout.write(
-                    self.style.SUCCESS(
-                        f"Successfully loaded {len(users_to_create)} users."
+                    self.style.WARNING(
+                        f"Skipped {stats.errors} users with invalid data."
                     )
                 )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Successfully loaded {stats.written} users from {stats.rows} rows "
+                    f"in {stats.elapsed:.1f}s ({stats.rate:.0f} rows/s)."
+                )
+            )
 
         except FileNotFoundError:
             self.stderr.write(self.style.ERROR(f"File not found: {file_path}"))
-        except KeyError as e:
-            self.stderr.write(
-                self.style.ERROR(f"Missing required column in CSV file: {str(e)}")
-            )
         except Exception as e:
             self.stderr.write(self.style.ERROR(f"An error occurred: {str(e)}"))
+
+    def save_batch(self, batch, resume_offset):
+        # Each batch commits on its own, users loaded by an earlier run are skipped
+        with transaction.atomic():
+            User.objects.bulk_create(
+                [
+                    User(
+                        user_id=user_id,
+                        name=name,
+                        review_count=review_count,
+                        account_since=account_since,
+                        average_rating=average_rating,
+                    )
+                    for user_id, name, review_count, account_since, average_rating in batch
+                ],
+                ignore_conflicts=True,
+            )
+        self.stdout.write(
+            f"Committed {len(batch)} users, resume with --start-offset {resume_offset}"
+        )
+        return len(batch)
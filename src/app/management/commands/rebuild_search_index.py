@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.search import is_indexed, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over restaurant names and cities"
+
+    def handle(self, *args, **options):
+        if not is_indexed():
+            self.stdout.write(
+                "Nothing to rebuild, this database searches through trigram indexes."
+            )
+            return
+
+        start = time.perf_counter()
+        indexed = rebuild_index()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {indexed} restaurants in {time.perf_counter() - start:.1f}s."
+            )
+        )
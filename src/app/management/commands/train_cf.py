@@ -0,0 +1,83 @@
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from app.cf import CFModel, train_als
+from app.models import Review
+
+
+class Command(BaseCommand):
+    help = "Train the collaborative-filtering model from the Review table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            type=str,
+            default=getattr(settings, "RECOMMENDER_CF_MODEL", None),
+            help="Directory to save the factors to (defaults to RECOMMENDER_CF_MODEL).",
+        )
+        parser.add_argument("--factors", type=int, default=32)
+        parser.add_argument("--reg", type=float, default=0.1)
+        parser.add_argument("--iterations", type=int, default=10)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of solver threads.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["output"]:
+            self.stderr.write(
+                self.style.ERROR("No --output given and RECOMMENDER_CF_MODEL is unset.")
+            )
+            return
+
+        start = time.perf_counter()
+        reviews = Review.objects.values_list("user_id", "business_id", "rating")
+        n_reviews = reviews.count()
+        user_pks = np.empty(n_reviews, dtype=np.int64)
+        item_pks = np.empty(n_reviews, dtype=np.int64)
+        ratings = np.empty(n_reviews, dtype=np.float32)
+        n = 0
+        for user_pk, item_pk, rating in reviews.iterator(chunk_size=10000):
+            if n == n_reviews:
+                break
+            user_pks[n], item_pks[n], ratings[n] = user_pk, item_pk, rating
+            n += 1
+        user_pks, item_pks, ratings = user_pks[:n], item_pks[:n], ratings[:n]
+
+        # Contiguous indices; np.unique also sorts the primary keys for lookups
+        user_ids, user_index = np.unique(user_pks, return_inverse=True)
+        item_ids, item_index = np.unique(item_pks, return_inverse=True)
+        self.stdout.write(
+            f"Loaded {n} ratings of {len(user_ids)} users for {len(item_ids)} "
+            f"restaurants in {time.perf_counter() - start:.1f}s."
+        )
+
+        user_factors, item_factors, global_mean = train_als(
+            user_index,
+            item_index,
+            ratings,
+            len(user_ids),
+            len(item_ids),
+            factors=options["factors"],
+            reg=options["reg"],
+            iterations=options["iterations"],
+            workers=options["workers"],
+            callback=lambda i, rmse: self.stdout.write(
+                f"Iteration {i + 1}: train RMSE {rmse:.4f}"
+            ),
+        )
+
+        CFModel(user_ids, item_ids, user_factors, item_factors, global_mean).save(
+            options["output"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Model saved to {options['output']} in "
+                f"{time.perf_counter() - start:.1f}s."
+            )
+        )
@@ -0,0 +1,82 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0005_userprofile"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="restaurant",
+            index=models.Index(fields=["-rating", "-id"], name="rest_rating_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="restaurant",
+            index=models.Index(
+                fields=["city", "-rating", "-id"], name="rest_city_rating_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="restaurant",
+            index=models.Index(
+                fields=["price_range", "-rating", "-id"], name="rest_price_rating_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="restaurant",
+            index=models.Index(
+                condition=models.Q(("delivery", True)),
+                fields=["-rating", "-id"],
+                name="rest_delivery_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="restaurant",
+            index=models.Index(
+                condition=models.Q(("take_out", True)),
+                fields=["-rating", "-id"],
+                name="rest_take_out_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="restaurant",
+            index=models.Index(
+                condition=models.Q(("delivery", True), ("take_out", True)),
+                fields=["-rating", "-id"],
+                name="rest_delivery_take_out_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="restaurant",
+            index=models.Index(
+                condition=models.Q(("good_for_kids", True)),
+                fields=["-rating", "-id"],
+                name="rest_good_for_kids_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="restaurant",
+            index=models.Index(
+                condition=models.Q(("good_for_groups", True)),
+                fields=["-rating", "-id"],
+                name="rest_good_for_groups_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="restaurant",
+            index=models.Index(
+                condition=models.Q(("outdoor_seating", True)),
+                fields=["-rating", "-id"],
+                name="rest_outdoor_seating_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["user_id", "business_id"], name="review_user_business_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+# Frozen copy of app.search.SEARCH_TABLE, migrations must not follow the app code
+SEARCH_TABLE = "app_restaurant_search"
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite":
+        # Accent-insensitive words, with prefix indexes for short autocomplete terms
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+            "name, city, review_count UNINDEXED, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, name, city, review_count) "
+            "SELECT id, name, city, review_count FROM app_restaurant"
+        )
+    elif connection.vendor == "postgresql":
+        # Django compiles icontains to UPPER(column::text) LIKE UPPER(%s)
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for column in ("name", "city"):
+            schema_editor.execute(
+                f"CREATE INDEX rest_{column}_trgm_idx ON app_restaurant "
+                f"USING gin (UPPER({column}::text) gin_trgm_ops)"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+    elif connection.vendor == "postgresql":
+        for column in ("name", "city"):
+            schema_editor.execute(f"DROP INDEX IF EXISTS rest_{column}_trgm_idx")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0006_restaurant_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Frozen copy of app.search.SEARCH_TABLE, migrations must not follow the app code
+SEARCH_TABLE = "app_restaurant_search"
+
+
+def recreate_search_table(columns):
+    def recreate(apps, schema_editor):
+        # FTS5 tables cannot drop columns, the table is rebuilt and refilled
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+            f"{', '.join(columns)}, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3')"
+        )
+        names = ", ".join(column.split()[0] for column in columns)
+        schema_editor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, {names}) "
+            f"SELECT id, {names} FROM app_restaurant"
+        )
+
+    return recreate
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0008_dataversion"),
+    ]
+
+    operations = [
+        # review_count was stored for ranking but never read
+        migrations.RunPython(
+            recreate_search_table(["name", "city"]),
+            recreate_search_table(["name", "city", "review_count UNINDEXED"]),
+        ),
+    ]
@@ -56,6 +56,50 @@ class Restaurant(models.Model):
     sunday_open = models.TimeField(null=True, blank=True)
     sunday_close = models.TimeField(null=True, blank=True)
 
+    class Meta:
+        # Chosen from `manage.py explain_filters`: listings are ordered by
+        # (rating, id), so indexes end with those columns to avoid a sort
+        indexes = [
+            models.Index(fields=["-rating", "-id"], name="rest_rating_idx"),
+            models.Index(
+                fields=["city", "-rating", "-id"], name="rest_city_rating_idx"
+            ),
+            models.Index(
+                fields=["price_range", "-rating", "-id"], name="rest_price_rating_idx"
+            ),
+            # Partial indexes for the most used amenity filters and combinations
+            models.Index(
+                fields=["-rating", "-id"],
+                condition=models.Q(delivery=True),
+                name="rest_delivery_idx",
+            ),
+            models.Index(
+                fields=["-rating", "-id"],
+                condition=models.Q(take_out=True),
+                name="rest_take_out_idx",
+            ),
+            models.Index(
+                fields=["-rating", "-id"],
+                condition=models.Q(delivery=True, take_out=True),
+                name="rest_delivery_take_out_idx",
+            ),
+            models.Index(
+                fields=["-rating", "-id"],
+                condition=models.Q(good_for_kids=True),
+                name="rest_good_for_kids_idx",
+            ),
+            models.Index(
+                fields=["-rating", "-id"],
+                condition=models.Q(good_for_groups=True),
+                name="rest_good_for_groups_idx",
+            ),
+            models.Index(
+                fields=["-rating", "-id"],
+                condition=models.Q(outdoor_seating=True),
+                name="rest_outdoor_seating_idx",
+            ),
+        ]
+
     def __str__(self):
         return (
             "Restaurant: "
@@ -121,5 +165,40 @@ class Review(models.Model):
     date = models.DateField()  # Review date
     text = models.TextField()
 
+    class Meta:
+        indexes = [
+            # Reviews of a user and the restaurants they reviewed, without the table
+            models.Index(
+                fields=["user_id", "business_id"], name="review_user_business_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"Review {self.review_id} from user {self.user_id} for Business {self.business_id}"
+
+
+# Recommender profile of a user
+class UserProfile(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
+
+    # Rating-weighted sum of the features of reviewed restaurants (float32 bytes)
+    weights = models.BinaryField(default=b"")
+    # Fingerprint of the feature columns the weights were computed against
+    layout = models.CharField(max_length=40, default="")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Profile of user {self.user_id}"
+
+
+class DataVersion(models.Model):
+    """
+    Counter bumped whenever the data behind the in-memory indexes changes, so
+    that every process, not only the one that saved, rebuilds them (app/stores.py).
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
@@ -0,0 +1,37 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+
+
+def encode_cursor(score, pk, depth):
+    """
+    Opaque cursor pointing after an item ranked `depth`-th with the given score.
+    """
+    data = json.dumps([float(score), int(pk), int(depth)]).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    (score, pk, depth) of a cursor made by `encode_cursor`, ValueError if invalid.
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        score, pk, depth = json.loads(data)
+        return float(score), int(pk), int(depth)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+
+def rating_page(queryset, size, after=None):
+    """
+    Restaurants ordered by rating and primary key, both descending, starting
+    after the cursor position `after`. Seeks instead of using OFFSET.
+    """
+    queryset = queryset.order_by("-rating", "-pk")
+    if after is not None:
+        rating, pk = after[:2]
+        queryset = queryset.filter(Q(rating__lt=rating) | Q(rating=rating, pk__lt=pk))
+    return queryset[:size]
@@ -0,0 +1,95 @@
+import numpy as np
+from django.db import transaction
+
+from .features import feature_store
+from .models import Review, User, UserProfile
+
+
+def compute_weights(snapshot, business_pks, ratings):
+    """
+    Rating-weighted sum of the features of the given restaurants.
+    Returns None if none of the restaurants is in the feature matrix.
+    """
+    rows, known = snapshot.lookup(business_pks)
+    if len(rows) == 0:
+        return None
+    ratings = np.asarray(ratings, dtype=np.float32)[known]
+    return np.dot(ratings, snapshot.matrix[rows])
+
+
+def encode_weights(weights) -> bytes:
+    if weights is None:
+        return b""
+    return np.asarray(weights, dtype=np.float32).tobytes()
+
+
+def decode_weights(data):
+    if not data:
+        return None
+    return np.frombuffer(bytes(data), dtype=np.float32)
+
+
+def get_user_weights(user_pk, snapshot=None):
+    """
+    Preference vector of a user, read from the persisted profile.
+    Profiles computed against another feature layout are rebuilt on the fly.
+    """
+    if user_pk is None:
+        return None
+    if snapshot is None:
+        snapshot = feature_store.snapshot()
+    profile = (
+        UserProfile.objects.filter(user_id=user_pk).only("weights", "layout").first()
+    )
+    if profile is not None and profile.layout == snapshot.layout:
+        return decode_weights(profile.weights)
+    return rebuild_user_profile(user_pk, snapshot)
+
+
+def rebuild_user_profile(user_pk, snapshot=None):
+    """
+    Recompute the profile of one user from their reviews, empty without any.
+    """
+    if snapshot is None:
+        snapshot = feature_store.snapshot()
+    reviews = list(
+        Review.objects.filter(user_id=user_pk).values_list("business_id", "rating")
+    )
+    weights = None
+    if reviews:
+        business_pks, ratings = zip(*reviews)
+        weights = compute_weights(snapshot, business_pks, ratings)
+    # Users without reviews get an empty profile, so the next lookup is a single read
+    if reviews or User.objects.filter(pk=user_pk).exists():
+        UserProfile.objects.update_or_create(
+            user_id=user_pk,
+            defaults={"weights": encode_weights(weights), "layout": snapshot.layout},
+        )
+    return weights
+
+
+def add_review_to_profile(review, snapshot=None):
+    """
+    Fold a newly created review into its author's profile.
+    """
+    if snapshot is None:
+        snapshot = feature_store.snapshot()
+    with transaction.atomic():
+        profile = (
+            UserProfile.objects.select_for_update()
+            .filter(user_id=review.user_id_id)
+            .first()
+        )
+        if profile is None or profile.layout != snapshot.layout:
+            rebuild_user_profile(review.user_id_id, snapshot)
+            return
+
+        rows, _ = snapshot.lookup([review.business_id_id])
+        if len(rows) == 0:
+            return
+        weights = decode_weights(profile.weights)
+        if weights is None:
+            weights = np.zeros(snapshot.matrix.shape[1], dtype=np.float32)
+        weights = weights + float(review.rating) * snapshot.matrix[rows[0]]
+        profile.weights = encode_weights(weights)
+        profile.save(update_fields=["weights", "updated_at"])
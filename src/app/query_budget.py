@@ -0,0 +1,37 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryBudget:
+    """
+    Context manager raising QueryBudgetExceeded as soon as the code it wraps runs
+    more than `limit` database queries. It can be entered several times, queries
+    of all blocks count towards the same budget.
+    """
+
+    def __init__(self, limit, label="block", using=DEFAULT_DB_ALIAS):
+        self.limit = limit
+        self.label = label
+        self.using = using
+        self.queries = 0
+        self._wrappers = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        if self.queries > self.limit:
+            raise QueryBudgetExceeded(
+                f"{self.label} ran more than {self.limit} queries, the last was: {sql}"
+            )
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        wrapper = connections[self.using].execute_wrapper(self)
+        wrapper.__enter__()
+        self._wrappers.append(wrapper)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrappers.pop().__exit__(*exc_info)
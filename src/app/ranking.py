@@ -0,0 +1,59 @@
+import numpy as np
+
+
+def top_n(scores, n):
+    """
+    Indices of the n highest scores, best first.
+    Uses a partial selection so only the selected items get sorted.
+    """
+    scores = np.asarray(scores)
+    if n <= 0 or len(scores) == 0:
+        return np.empty(0, dtype=np.intp)
+    if n < len(scores):
+        candidates = np.argpartition(-scores, n - 1)[:n]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def rank(pks, scores, n, after=None):
+    """
+    Primary keys and scores of the top n items, ordered by score and then by
+    primary key, both descending. With `after`, the (score, pk, ...) of the last
+    item of a previous page, only items ranked below it are considered.
+    """
+    pks = np.asarray(pks)
+    scores = np.asarray(scores)
+    if after is not None:
+        score, pk = after[:2]
+        below = (scores < score) | ((scores == score) & (pks < pk))
+        pks, scores = pks[below], scores[below]
+
+    order = top_n(scores, n)
+    if 0 < len(order) < len(scores):
+        # Of the items tied with the last selected one, keep the highest primary keys
+        boundary = scores[order[-1]]
+        above = order[scores[order] > boundary]
+        tied = np.flatnonzero(scores == boundary)
+        tied = tied[np.argsort(-pks[tied], kind="stable")][: n - len(above)]
+        order = np.concatenate([above, tied])
+    order = order[np.lexsort((-pks[order], -scores[order]))]
+    return pks[order], scores[order]
+
+
+def hydrate(queryset, pks, scores=None):
+    """
+    Fetch the given rows with a single query and return them in the order of `pks`.
+    If scores are given, they are attached as `recommendation_score`.
+    """
+    pks = [int(pk) for pk in pks]
+    objects = queryset.in_bulk(pks)
+    ranked = []
+    for i, pk in enumerate(pks):
+        obj = objects.get(pk)
+        if obj is None:
+            continue
+        if scores is not None:
+            obj.recommendation_score = float(scores[i])
+        ranked.append(obj)
+    return ranked
@@ -1,94 +1,114 @@
 import numpy as np
-import pandas as pd
+from django.conf import settings
+
+from .ann import ann_index
+from .cf import cf_model
+from .features import feature_store
+from .pagination import rating_page
+from .profiles import get_user_weights
+from .ranking import rank, hydrate
 
 
 class Recommender:
-    def __init__(self, businesses, reviews):
+    def __init__(self, businesses, reviews, store=feature_store):
         self.businesses = businesses
         self.reviews = reviews
+        # Features of the whole catalogue, shared by all requests of this process
+        self.features = store.snapshot()
         self.user_weights = None
+        self.user_factors = None
         self.target_user_id = None
 
-    def prepare_features(self, df):
-        # Remove unnecessary columns
-        feature_df = df.drop(
-            [
-                "postal_code",
-                "city",
-                "state",
-                "address",
-                "name",
-                "latitude",
-                "longitude",
-                "monday_open",
-                "monday_close",
-                "tuesday_open",
-                "tuesday_close",
-                "wednesday_open",
-                "wednesday_close",
-                "thursday_open",
-                "thursday_close",
-                "friday_open",
-                "friday_close",
-                "saturday_open",
-                "saturday_close",
-                "sunday_open",
-                "sunday_close",
-            ],
-            axis=1,
-        )
-        # print(feature_df.head())
-        # Take business_id as index
-        feature_df.set_index("business_id", inplace=True)
-        # Normalize stars and review_count
-        feature_df["rating"] = (
-            feature_df["rating"] - feature_df["rating"].mean()
-        ) / feature_df["rating"].std()
-        feature_df["review_count"] = (
-            feature_df["review_count"] - feature_df["review_count"].mean()
-        ) / feature_df["review_count"].std()
-        return feature_df
-
     def fit(self, user_id):
-        reviews_df = pd.DataFrame.from_records(self.reviews.values())
+        # Preference vectors are persisted per user and kept up to date on new reviews
         self.target_user_id = user_id
-        user_reviews = reviews_df[reviews_df["user_id_id"] == user_id]
+        self.user_weights = get_user_weights(user_id, self.features)
+        # Latent factors of the user, if the collaborative-filtering model knows them
+        model = cf_model.model()
+        self.user_factors = model.user_vector(user_id) if model is not None else None
 
-        if user_reviews.empty:
-            self.user_weights = None
-        else:
-            user_businesses = self.businesses[
-                self.businesses["business_id_id"].isin(user_reviews["business_id_id"])
-            ]
-            features = self.prepare_features(user_businesses)
-            ratings = user_reviews["rating"]
-            self.user_weights = np.dot(ratings.values, features.values)
+    def candidates(self, businesses, pks=None):
+        """
+        Primary keys of the filtered businesses. `pks`, from the bitmap filter
+        engine (app/bitmaps.py), restricts them further. A queryset without
+        filters of its own is not read at all: its businesses are `pks`, or
+        else the whole catalogue of the feature snapshot.
+        """
+        if not businesses.query.has_filters():
+            if pks is None:
+                return self.features.pks
+            return np.asarray(pks, dtype=np.int64)
+        found = np.fromiter(businesses.values_list("pk", flat=True), dtype=np.int64)
+        if pks is not None:
+            found = found[np.isin(found, pks)]
+        return found
 
-    def predict(self, businesses, top_n=500):
-        # Convert the queryset to a DataFrame for processing
-        businesses_df = pd.DataFrame.from_records(businesses.values())
+    def rank(self, businesses, top_n=500, mode="exact", after=None, candidates=None):
+        """
+        Score the filtered businesses and return the primary keys and scores
+        of the top N, best first. `after` is the (score, pk, depth) of the last
+        item of a previous page, see app/pagination.py.
+        mode="exact" scores every candidate, mode="ann" searches the IVF index
+        and uses the filtered businesses as a post-filter, scoring them exactly
+        while the index is being built or when they are at most
+        RECOMMENDER_ANN_MIN_CANDIDATES, mode="cf" scores
+        every candidate with the collaborative-filtering model.
+        """
+        if mode == "cf" and self.user_factors is not None:
+            pks = self.candidates(businesses, candidates)
+            scores = cf_model.model().score(self.user_factors, pks)
+            return rank(pks, scores, top_n, after)
 
-        # Prepare features for the filtered businesses
-        all_features = self.prepare_features(businesses_df)
+        query = self.user_weights / np.sum(self.user_weights)
 
-        if self.user_weights is None:
-            # Recommend top-rated restaurants (bestsellers) if no reviews
-            return businesses.order_by("-rating")[:top_n]
+        filtered = businesses.query.has_filters() or candidates is not None
+        pks = self.candidates(businesses, candidates) if filtered else None
+        index = ann_index.index(self.features) if mode == "ann" else None
+        # Scoring a few thousand rows exactly costs about as much as a search,
+        # and its pages never miss an item
+        n_candidates = len(self.features) if pks is None else len(pks)
+        if index is not None and n_candidates > settings.RECOMMENDER_ANN_MIN_CANDIDATES:
+            allowed = None
+            if pks is not None:
+                rows, _ = self.features.lookup(pks)
+                allowed = np.zeros(len(self.features), dtype=bool)
+                allowed[rows] = True
+            # The index cannot seek: search past the items of previous pages, and
+            # further while deeper searches surface items ranked above the cursor.
+            # Items of lists not probed are never returned, deep pages of large
+            # candidate sets can thus skip some
+            k = top_n + (after[2] if after is not None else 0)
+            while True:
+                rows, scores = index.search(query, k, allowed=allowed)
+                ranked, scores = rank(self.features.pks[rows], scores, top_n, after)
+                if len(ranked) >= top_n or len(rows) < k:
+                    return ranked, scores
+                k *= 2
 
-        # Compute recommendation scores using vectorized dot product
-        scores = np.dot(all_features.values, self.user_weights) / np.sum(
-            self.user_weights
-        )
+        # Without filters every row of the feature matrix is scored
+        if pks is None:
+            scores = np.dot(self.features.matrix, query)
+            return rank(self.features.pks, scores, top_n, after)
 
-        # Add scores to the DataFrame
-        businesses_df["recommendation_score"] = scores
+        # Score the filtered businesses by slicing their rows of the feature matrix
+        rows, known = self.features.lookup(pks)
+        scores = np.dot(self.features.matrix[rows], query)
+        return rank(pks[known], scores, top_n, after)
 
-        # Sort by recommendation score and get top N
-        top_recommendations = businesses_df.sort_values(
-            by="recommendation_score", ascending=False
-        ).head(top_n)
+    def predict(self, businesses, top_n=500, mode="exact", after=None, candidates=None):
+        if self.user_weights is None and (mode != "cf" or self.user_factors is None):
+            # Recommend top-rated restaurants (bestsellers) if no reviews
+            if candidates is None:
+                return list(rating_page(businesses, top_n, after))
+            # Same order as rating_page, from the ratings kept in memory
+            rows, known = self.features.lookup(self.candidates(businesses, candidates))
+            pks, _ = rank(
+                self.features.pks[rows], self.features.ratings[rows], top_n, after
+            )
+            return hydrate(businesses, pks)
 
-        # Filter the original queryset to include only the top recommendations
-        return businesses.filter(
-            business_id__in=top_recommendations["business_id_id"]
-        ).order_by("-recommendation_score")
+        # Fetch only the top recommendations, keeping their ranking
+        pks, scores = self.rank(
+            businesses, top_n, mode=mode, after=after, candidates=candidates
+        )
+        return hydrate(businesses, pks, scores)
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Model
+
+from .stores import catalog_version, reviews_version
+
+
+def canonical(cleaned_data):
+    """
+    JSON text identifying a search: empty filters are dropped, model instances
+    become their primary key, keys are sorted.
+    """
+    values = {}
+    for field, value in cleaned_data.items():
+        if value is None or value == "" or value is False:
+            continue
+        if isinstance(value, Model):
+            value = value.pk
+        values[field] = value
+    return json.dumps(values, sort_keys=True, default=str, separators=(",", ":"))
+
+
+class ResultCache:
+    """
+    Ranked primary keys of restaurant searches, stored in the Django cache
+    `alias` (see RESULT_CACHE_ALIAS). Keys embed a generation number which
+    `invalidate`, wired to Restaurant and Review changes in `signals.py`, bumps:
+    older results are then never read again and expire from the cache.
+    With a cache shared by the workers, such as FileBasedCache, so is the generation.
+    Keys also embed `versions`, SharedVersions which other processes and bulk
+    loads bump, so that per-process caches miss after their writes too.
+    """
+
+    def __init__(self, alias="default", timeout=600, prefix="results", versions=()):
+        self.alias = alias
+        self.versions = versions
+        self.timeout = timeout
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.entries = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def generation(self):
+        return self.cache.get_or_set(f"{self.prefix}:generation", 0, timeout=None)
+
+    def invalidate(self):
+        try:
+            self.cache.incr(f"{self.prefix}:generation")
+        except ValueError:
+            # Evicted or never set, any other value starts a new generation
+            self.cache.set(f"{self.prefix}:generation", 1, timeout=None)
+        with self._lock:
+            self.entries = 0
+            self.bytes = 0
+
+    def key(self, cleaned_data, *context):
+        """
+        Cache key of a search given its cleaned form data and anything else its
+        results depend on, such as the user or the number of results.
+        """
+        search = json.dumps([canonical(cleaned_data), *context], default=str)
+        digest = hashlib.sha1(search.encode("utf-8")).hexdigest()
+        versions = ".".join(str(version.current()) for version in self.versions)
+        return f"{self.prefix}:{self.generation()}:{versions}:{digest}"
+
+    def get(self, key):
+        """
+        (pks, scores) stored under `key`, None if missing. `scores` is None for
+        results ranked by rating.
+        """
+        ranked = self.cache.get(key)
+        with self._lock:
+            if ranked is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return ranked
+
+    def set(self, key, pks, scores=None):
+        ranked = ([int(pk) for pk in pks], scores and [float(s) for s in scores])
+        self.cache.set(key, ranked, timeout=self.timeout)
+        with self._lock:
+            self.entries += 1
+            self.bytes += len(json.dumps(ranked))
+
+    def stats(self):
+        """
+        Lookups of this process, and the entries it wrote in the current generation.
+        """
+        generation = self.generation()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "generation": generation,
+                "entries": self.entries,
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+result_cache = ResultCache(
+    alias=getattr(settings, "RESULT_CACHE_ALIAS", "default"),
+    timeout=getattr(settings, "RESULT_CACHE_TIMEOUT", 600),
+    versions=(catalog_version, reviews_version),
+)
@@ -0,0 +1,100 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+# FTS5 table over restaurant names and cities on SQLite, its rowid is the
+# restaurant primary key
+SEARCH_TABLE = "app_restaurant_search"
+
+
+def is_indexed(using=None):
+    """
+    Whether the database keeps the FTS5 search table, only SQLite does.
+    PostgreSQL relies on trigram indexes serving the icontains lookups instead.
+    """
+    return (using or connection).vendor == "sqlite"
+
+
+def help_text():
+    """
+    How the name and city filters match on this database, shown in the form.
+    """
+    if is_indexed():
+        return (
+            "Matches words starting with the words typed, in any order, "
+            "ignoring accents."
+        )
+    return "Matches the text typed anywhere, accents included."
+
+
+def match_query(term, column=None):
+    """
+    FTS5 query matching every word of `term` as a prefix, e.g. "pizz phil" gives
+    '"pizz"* "phil"*'. Returns None when `term` has no words.
+    """
+    words = re.findall(r"\w+", term.lower())
+    if not words:
+        return None
+    query = " ".join(f'"{word}"*' for word in words)
+    return f"{column} : ({query})" if column else query
+
+
+def filter_restaurants(restaurants, column, term):
+    """
+    Narrow a Restaurant queryset to those whose `column` ("name" or "city")
+    has words starting with the words of `term`. PostgreSQL matches `term` as
+    a substring instead, e.g. "zza" finds "Pizza" there but not on SQLite.
+    """
+    if not is_indexed():
+        return restaurants.filter(**{f"{column}__icontains": term})
+    query = match_query(term, column)
+    if query is None:
+        return restaurants
+    return restaurants.filter(
+        pk__in=RawSQL(
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [query]
+        )
+    )
+
+
+def index_restaurant(restaurant):
+    """
+    Add or refresh the search entry of a restaurant.
+    """
+    if not is_indexed():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [restaurant.pk])
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, name, city) VALUES (%s, %s, %s)",
+            [restaurant.pk, restaurant.name, restaurant.city],
+        )
+
+
+def unindex_restaurant(pk):
+    if not is_indexed():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [pk])
+
+
+def rebuild_index(using=None):
+    """
+    Refill the search table from app_restaurant, needed after bulk loads which
+    bypass the save signals. Returns the number of indexed restaurants.
+    """
+    using = using or connection
+    if not is_indexed(using):
+        return 0
+    with using.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, name, city) "
+            "SELECT id, name, city FROM app_restaurant"
+        )
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')"
+        )
+        cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE}")
+        return cursor.fetchone()[0]
@@ -0,0 +1,130 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch, QuerySet, prefetch_related_objects
+
+from .models import Ambience, Cuisine, Restaurant
+
+# Columns of a restaurant in /api/restaurants/ responses, besides cuisine and ambience
+RESTAURANT_FIELDS = [
+    "name",
+    "rating",
+    "city",
+    "price_range",
+    "delivery",
+    "good_for_kids",
+    "good_for_groups",
+    "take_out",
+    "reservations",
+    "outdoor_seating",
+    "wheelchair_accessible",
+    "bike_parking",
+    "credit_cards_accepted",
+    "happy_hour",
+    "dogs_allowed",
+    "sustainable",
+    "latitude",
+    "longitude",
+    "monday_open",
+    "monday_close",
+    "tuesday_open",
+    "tuesday_close",
+    "wednesday_open",
+    "wednesday_close",
+    "thursday_open",
+    "thursday_close",
+    "friday_open",
+    "friday_close",
+    "saturday_open",
+    "saturday_close",
+    "sunday_open",
+    "sunday_close",
+]
+
+
+def prefetch_categories(restaurants):
+    """
+    Load only the listed columns of restaurants, with their cuisines and
+    ambiences in one query each, whatever the number of restaurants.
+    """
+    prefetches = [
+        Prefetch("cuisines", queryset=Cuisine.objects.only("name")),
+        Prefetch("ambiences", queryset=Ambience.objects.only("name")),
+    ]
+    if isinstance(restaurants, QuerySet):
+        # The map of restaurant_list.html also shows these
+        fields = RESTAURANT_FIELDS + ["business_id", "review_count"]
+        return restaurants.only(*fields).prefetch_related(*prefetches)
+    prefetch_related_objects(restaurants, *prefetches)
+    return restaurants
+
+
+def _rows(restaurants):
+    """
+    Field values of restaurants, a queryset (only the needed columns are selected)
+    or a list of instances such as a ranked recommendation list.
+    """
+    if isinstance(restaurants, QuerySet):
+        return restaurants.values("pk", *RESTAURANT_FIELDS).iterator(chunk_size=2000)
+    return (
+        {"pk": restaurant.pk, **{f: getattr(restaurant, f) for f in RESTAURANT_FIELDS}}
+        for restaurant in restaurants
+    )
+
+
+def _names(through, column, pks):
+    """
+    Category names per restaurant for a chunk of restaurants, in one query.
+    """
+    names = {pk: [] for pk in pks}
+    for restaurant_id, name in (
+        through.objects.filter(restaurant_id__in=pks)
+        .order_by("pk")
+        .values_list("restaurant_id", f"{column}__name")
+    ):
+        names[restaurant_id].append(name)
+    return names
+
+
+def iter_restaurants(restaurants, chunk_size=100):
+    """
+    Yield restaurants as response dicts, in order. Cuisines and ambiences are
+    fetched with two queries per chunk instead of two per restaurant.
+    """
+    chunk = []
+    for row in _rows(restaurants):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield from _with_categories(chunk)
+            chunk = []
+    if chunk:
+        yield from _with_categories(chunk)
+
+
+def _with_categories(chunk):
+    pks = [row["pk"] for row in chunk]
+    cuisines = _names(Restaurant.cuisines.through, "cuisine", pks)
+    ambiences = _names(Restaurant.ambiences.through, "ambience", pks)
+    for row in chunk:
+        pk = row.pop("pk")
+        yield {
+            "name": row.pop("name"),
+            "cuisine": cuisines[pk],
+            "ambience": ambiences[pk],
+            **row,
+        }
+
+
+def stream_restaurants(restaurants, key="restaurants", extra=None):
+    """
+    Encode restaurants as `{"restaurants": [...]}` piece by piece, for a
+    StreamingHttpResponse, so the first rows are sent before the last are read.
+    Items of `extra` are added to the object after the list.
+    """
+    yield f'{{"{key}": ['
+    for i, restaurant in enumerate(iter_restaurants(restaurants)):
+        yield ("," if i else "") + json.dumps(restaurant, cls=DjangoJSONEncoder)
+    yield "]"
+    for name, value in (extra or {}).items():
+        yield f", {json.dumps(name)}: {json.dumps(value, cls=DjangoJSONEncoder)}"
+    yield "}"
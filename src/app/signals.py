@@ -0,0 +1,68 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Restaurant, Cuisine, Ambience, Review, UserProfile
+from .profiles import add_review_to_profile
+from .results import result_cache
+from .search import index_restaurant, unindex_restaurant
+from .stores import catalog_version, reviews_version
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_save, sender=Cuisine)
+@receiver(post_delete, sender=Cuisine)
+@receiver(post_save, sender=Ambience)
+@receiver(post_delete, sender=Ambience)
+@receiver(m2m_changed, sender=Restaurant.cuisines.through)
+@receiver(m2m_changed, sender=Restaurant.ambiences.through)
+def bump_catalog_version(sender, action="post_save", **kwargs):
+    # Features, bitmaps, opening hours, coordinates, names and vocabularies are
+    # rebuilt on next use, in every process
+    if action.startswith("post_"):
+        catalog_version.bump()
+
+
+@receiver(post_save, sender=Restaurant)
+def update_search_index(sender, instance, **kwargs):
+    # Keep the name/city search entry in step with the restaurant
+    index_restaurant(instance)
+
+
+@receiver(post_delete, sender=Restaurant)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_restaurant(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def bump_reviews_version(sender, **kwargs):
+    # Part of the result cache keys, other processes miss their cached rankings
+    reviews_version.bump()
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(m2m_changed, sender=Restaurant.cuisines.through)
+@receiver(m2m_changed, sender=Restaurant.ambiences.through)
+def invalidate_search_results(sender, action="post_save", **kwargs):
+    # Cached rankings may be out of date, start a new generation
+    if action.startswith("post_"):
+        result_cache.invalidate()
+
+
+@receiver(post_save, sender=Review)
+def update_user_profile(sender, instance, created, **kwargs):
+    # Fold new reviews into the author's profile, edited ones need a rebuild
+    if created:
+        add_review_to_profile(instance)
+    else:
+        UserProfile.objects.filter(user_id=instance.user_id_id).delete()
+
+
+@receiver(post_delete, sender=Review)
+def drop_user_profile(sender, instance, **kwargs):
+    # The profile is rebuilt from the remaining reviews on next use
+    UserProfile.objects.filter(user_id=instance.user_id_id).delete()
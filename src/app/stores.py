@@ -0,0 +1,98 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import DataVersion
+
+
+class SharedVersion:
+    """
+    Version number of some data, stored in the database so that all workers
+    and management commands share it. `bump` increments it; `current` reads it
+    at most every `interval` seconds, so other processes see a change within
+    that delay while most calls cost nothing.
+    """
+
+    def __init__(self, name, interval=1.0):
+        self.name = name
+        self.interval = interval
+        self._value = None
+        self._checked = None
+
+    def current(self):
+        now = time.monotonic()
+        if self._checked is None or now - self._checked >= self.interval:
+            self._value = (
+                DataVersion.objects.filter(name=self.name)
+                .values_list("version", flat=True)
+                .first()
+            ) or 0
+            self._checked = now
+        return self._value
+
+    def bump(self):
+        updated = DataVersion.objects.filter(name=self.name).update(
+            version=F("version") + 1
+        )
+        if not updated:
+            DataVersion.objects.get_or_create(name=self.name, defaults={"version": 1})
+        # This process sees its own change at once
+        self._checked = None
+
+
+# Restaurants, their cuisines and ambiences: bumped by `signals.py` and after
+# bulk loads, which send no signals
+catalog_version = SharedVersion(
+    "catalog", interval=getattr(settings, "DATA_VERSION_CHECK_INTERVAL", 1.0)
+)
+# Reviews: bumped by `signals.py` and after `load_reviews`
+reviews_version = SharedVersion(
+    "reviews", interval=getattr(settings, "DATA_VERSION_CHECK_INTERVAL", 1.0)
+)
+
+
+class LazyIndex:
+    """
+    Process-wide value built by `build()` on first use, and again on the next
+    use after `invalidate` or after `version`, a SharedVersion, changed in any
+    process. Readers keep the previous value while another thread rebuilds it.
+    A failed build leaves the index stale, so the next use tries again.
+    """
+
+    def __init__(self, version=catalog_version):
+        self.version = version
+        self._lock = threading.Lock()
+        self._stale = True
+        self._built = None
+        self._index = None
+
+    def build(self):
+        raise NotImplementedError
+
+    @property
+    def is_stale(self):
+        return (
+            self._stale
+            or self._index is None
+            or (self.version is not None and self.version.current() != self._built)
+        )
+
+    def invalidate(self):
+        self._stale = True
+
+    def index(self):
+        # Only the first build makes readers wait
+        if self.is_stale:
+            with self._lock:
+                if self.is_stale:
+                    # Cleared first so that changes made during the build trigger another one
+                    self._stale = False
+                    self._built = self.version.current() if self.version else None
+                    try:
+                        self._index = self.build()
+                    except BaseException:
+                        self._stale = True
+                        raise
+        return self._index
@@ -1 +1,865 @@
-from django.test import TestCase
+import csv
+import inspect
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import date, datetime
+from datetime import time as clock
+
+import numpy as np
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from .ann import ann_index
+from .autocomplete import AutocompleteIndex, fold
+from .batching import MicroBatcher
+from .bitmaps import filter_engine
+from .classifier import forward_order
+from .features import BOOLEAN_FEATURES, feature_store
+from .geo import GeoIndex, haversine_km
+from .hours import OpeningHoursIndex
+from .ingest import ingest, split_records
+from .models import (
+    Ambience,
+    Cuisine,
+    DataVersion,
+    Restaurant,
+    Review,
+    User,
+    UserProfile,
+)
+from .pagination import decode_cursor, encode_cursor, rating_page
+from .profiles import get_user_weights
+from .query_budget import QueryBudget
+from .recommender import Recommender
+from .results import result_cache
+from .search import filter_restaurants, match_query, rebuild_index
+from .stores import catalog_version, reviews_version
+from .verdicts import VerdictCache, normalize_text
+from .vocabularies import cuisines
+
+
+def create_restaurants(n, seed=0):
+    rng = np.random.default_rng(seed)
+    Restaurant.objects.bulk_create(
+        Restaurant(
+            business_id=f"b{i}",
+            name=f"Restaurant {i}",
+            address=f"{i} Main Street",
+            city="Tampa",
+            rating=float(rng.integers(2, 11)) / 2,
+            review_count=int(rng.integers(0, 500)),
+            price_range=int(rng.integers(1, 5)),
+            **{flag: bool(rng.integers(0, 2)) for flag in BOOLEAN_FEATURES},
+        )
+        for i in range(n)
+    )
+    # Bulk creation sends no signals
+    feature_store.invalidate()
+
+
+class ANNRankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_restaurants(300)
+
+    def setUp(self):
+        self.recommender = Recommender(Restaurant.objects.all(), None)
+        self.recommender.user_weights = np.ones(
+            self.recommender.features.matrix.shape[1], dtype=np.float32
+        )
+        # Wait for the index built in the background
+        deadline = time.monotonic() + 30
+        while ann_index.index(self.recommender.features) is None:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.05)
+
+    def pages(self, businesses, mode, page_size=7):
+        pks, after = [], None
+        while True:
+            page, scores = self.recommender.rank(
+                businesses, page_size, mode=mode, after=after
+            )
+            pks += list(page)
+            if len(page) < page_size:
+                return pks
+            after = (scores[-1], page[-1], len(pks))
+
+    def test_few_candidates_are_scored_exactly(self):
+        businesses = Restaurant.objects.filter(delivery=True)
+        exact = self.pages(businesses, "exact")
+        self.assertEqual(len(exact), businesses.count())
+        self.assertEqual(self.pages(businesses, "ann"), exact)
+
+    def test_unfiltered_rankings_read_no_rows(self):
+        # The catalogue comes from the feature snapshot
+        with self.assertNumQueries(0):
+            pks, _ = self.recommender.rank(Restaurant.objects.all(), 20)
+            catalogue = self.recommender.candidates(Restaurant.objects.all())
+        filtered, _ = self.recommender.rank(Restaurant.objects.filter(pk__gt=0), 20)
+        self.assertEqual(list(pks), list(filtered))
+        self.assertEqual(
+            sorted(catalogue),
+            list(Restaurant.objects.values_list("pk", flat=True).order_by("pk")),
+        )
+
+    @override_settings(RECOMMENDER_ANN_MIN_CANDIDATES=0)
+    def test_ann_pages_are_ranked_subsets(self):
+        # Rows of the lists no search probes are skipped
+        businesses = Restaurant.objects.filter(delivery=True)
+        exact = self.pages(businesses, "exact")
+        pages = self.pages(businesses, "ann")
+        self.assertTrue(set(pages) <= set(exact))
+        self.assertEqual(pages, [pk for pk in exact if pk in set(pages)])
+
+
+class UserProfileTests(TestCase):
+    def test_users_without_reviews_keep_an_empty_profile(self):
+        user = User.objects.create(
+            user_id="u0", name="Ann", account_since=date.today(), average_rating=0
+        )
+        snapshot = feature_store.snapshot()
+        self.assertIsNone(get_user_weights(user.pk, snapshot))
+        profile = UserProfile.objects.get(user=user)
+        self.assertEqual(bytes(profile.weights), b"")
+        self.assertEqual(profile.layout, snapshot.layout)
+        # Read back, not rebuilt
+        with self.assertNumQueries(1):
+            self.assertIsNone(get_user_weights(user.pk, snapshot))
+
+    def test_unknown_users_have_no_profile(self):
+        self.assertIsNone(get_user_weights(12345, feature_store.snapshot()))
+        self.assertFalse(UserProfile.objects.exists())
+
+    def test_loaded_reviews_drop_the_profiles_of_their_authors(self):
+        create_restaurants(1)
+        users = [
+            User.objects.create(
+                user_id=f"u{i}",
+                name="Ann",
+                account_since=date.today(),
+                average_rating=0,
+            )
+            for i in range(2)
+        ]
+        snapshot = feature_store.snapshot()
+        for user in users:
+            get_user_weights(user.pk, snapshot)
+        version = reviews_version.current()
+
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(
+                ["review_id", "user_id", "business_id", "stars", "date", "text"]
+                + ["classification"]
+            )
+            writer.writerow(
+                ["r0", "u0", "b0", 5, "2020-01-01 12:00:00", "Great", "genuine"]
+            )
+        call_command("load_reviews", path, stdout=io.StringIO())
+
+        self.assertTrue(Review.objects.filter(user_id=users[0]).exists())
+        self.assertFalse(UserProfile.objects.filter(user=users[0]).exists())
+        self.assertTrue(UserProfile.objects.filter(user=users[1]).exists())
+        # Cached rankings are missed
+        self.assertGreater(reviews_version.current(), version)
+        self.assertIsNotNone(get_user_weights(users[0].pk, snapshot))
+
+
+class HomeQueryTests(TestCase):
+    # A few queries whatever the page size: restaurants are streamed in
+    # chunks and their categories prefetched
+    budget = 15
+
+    @classmethod
+    def setUpTestData(cls):
+        create_restaurants(300)
+        cuisines = Cuisine.objects.bulk_create(
+            Cuisine(name=f"Cuisine {i}") for i in range(5)
+        )
+        ambiences = Ambience.objects.bulk_create(
+            Ambience(name=f"Ambience {i}") for i in range(3)
+        )
+        for i, restaurant in enumerate(Restaurant.objects.all()):
+            restaurant.cuisines.set(cuisines[: i % 5 + 1])
+            restaurant.ambiences.set(ambiences[: i % 3])
+
+    def setUp(self):
+        result_cache.invalidate()
+
+    def get(self, params, **headers):
+        with QueryBudget(self.budget, label="home") as budget:
+            response = self.client.get("/api/restaurants/", params, **headers)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        return budget.queries
+
+    def test_xhr_pages(self):
+        for params in [{}, {"min_rating": 1}, {"delivery": "on"}]:
+            for page_size in [1, 50, 300]:
+                with self.subTest(**params, page_size=page_size):
+                    self.get(
+                        {**params, "page_size": page_size},
+                        HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+                    )
+
+    def test_html_page(self):
+        for params in [{}, {"min_rating": 1}, {"delivery": "on"}]:
+            with self.subTest(**params):
+                self.get(params)
+
+
+class OpeningHoursTests(TestCase):
+    def index(self, opens, closes):
+        # Open on Mondays only, 2024-01-01 is a Monday
+        hours = [None] * 14
+        hours[:2] = opens, closes
+        return OpeningHoursIndex.build([(1, *hours)])
+
+    def is_open(self, index, hour, minute, day=1):
+        return len(index.open_at(datetime(2024, 1, day, hour, minute))) == 1
+
+    def test_hours_off_slot_boundaries(self):
+        # Only the slots the restaurant is open for in full
+        index = self.index(clock(9, 3), clock(17, 2))
+        self.assertFalse(self.is_open(index, 9, 2))
+        self.assertFalse(self.is_open(index, 9, 4))
+        self.assertTrue(self.is_open(index, 9, 5))
+        self.assertTrue(self.is_open(index, 16, 59))
+        self.assertFalse(self.is_open(index, 17, 1))
+        self.assertFalse(self.is_open(index, 17, 4))
+
+    def test_windows_crossing_a_slot_boundary(self):
+        index = self.index(clock(9, 0), clock(17, 0))
+
+        def open_for(hour, minute, minutes):
+            when = datetime(2024, 1, 1, hour, minute)
+            return len(index.open_during(when, minutes)) == 1
+
+        self.assertTrue(open_for(16, 55, 5))
+        # 16:58 to 17:03 runs past closing time
+        self.assertFalse(open_for(16, 58, 5))
+        self.assertTrue(open_for(16, 50, 10))
+        self.assertFalse(open_for(16, 50, 11))
+        self.assertTrue(open_for(9, 0, 0))
+        self.assertFalse(open_for(8, 59, 1))
+
+    def test_hours_past_midnight(self):
+        index = self.index(clock(22, 0), clock(2, 0))
+        self.assertTrue(self.is_open(index, 23, 30))
+        self.assertTrue(self.is_open(index, 1, 55, day=2))
+        self.assertFalse(self.is_open(index, 2, 0, day=2))
+        self.assertFalse(self.is_open(index, 21, 55))
+
+
+class ResultCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_restaurants(60)
+        cls.cuisine = Cuisine.objects.create(name="Thai")
+        cls.cuisine.restaurants.set(Restaurant.objects.order_by("pk")[:30])
+        cls.first = Restaurant.objects.order_by("pk")[0]
+        Restaurant.objects.filter(pk=cls.first.pk).update(rating=0.5)
+
+    def setUp(self):
+        # Versions read by earlier tests were rolled back with them
+        catalog_version._checked = None
+        result_cache.invalidate()
+
+    def search(self, **params):
+        response = self.client.get(
+            "/api/restaurants/",
+            {"page_size": 100, **params},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        body = b"".join(response.streaming_content)
+        return [restaurant["name"] for restaurant in json.loads(body)["restaurants"]]
+
+    def test_category_links_invalidate_results(self):
+        self.assertEqual(len(self.search(cuisine=self.cuisine.pk)), 30)
+        restaurant = Restaurant.objects.order_by("pk").last()
+        restaurant.cuisines.add(self.cuisine)
+        found = self.search(cuisine=self.cuisine.pk)
+        self.assertEqual(len(found), 31)
+        self.assertIn(restaurant.name, found)
+
+    def test_writes_of_other_processes_invalidate_results(self):
+        self.assertEqual(len(self.search(min_rating=1)), 59)
+        # A bulk load in another process sends no signals, only bumps the version
+        Restaurant.objects.filter(pk=self.first.pk).update(rating=5.0)
+        DataVersion.objects.filter(name="catalog").update(version=F("version") + 1)
+        catalog_version._checked = None  # As after DATA_VERSION_CHECK_INTERVAL
+        self.assertEqual(len(self.search(min_rating=1)), 60)
+
+
+class ForwardOrderTests(TestCase):
+    def test_tokenizer_inputs_follow_the_forward_arguments(self):
+        def forward(input_ids=None, attention_mask=None, token_type_ids=None):
+            pass
+
+        tokenizer_order = ["input_ids", "token_type_ids", "attention_mask"]
+        self.assertEqual(
+            forward_order(inspect.signature(forward).parameters, tokenizer_order),
+            ["input_ids", "attention_mask", "token_type_ids"],
+        )
+
+    def test_unknown_arguments_keep_their_order(self):
+        self.assertEqual(
+            forward_order(["x", "y"], ["input_ids", "attention_mask"]),
+            ["input_ids", "attention_mask"],
+        )
+
+
+def parse_test_row(row):
+    # Module level, so that parser processes can import it
+    if row["keep"] != "yes":
+        return None
+    return int(row["id"]), row["text"]
+
+
+class IngestTests(TestCase):
+    def setUp(self):
+        self.rows = [
+            (i, "yes" if i % 3 else "no", text)
+            for i, text in enumerate(
+                [
+                    "plain",
+                    'with "quotes", and a comma',
+                    "several\nlines\n\nof text",
+                    '"\n"',
+                    "",
+                ]
+                * 40
+            )
+        ]
+        handle, self.path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["id", "unused", "keep", "text"])
+            for i, keep, text in self.rows:
+                writer.writerow([i, "x" * i, keep, text])
+        self.addCleanup(os.remove, self.path)
+
+    def records(self, start, end):
+        with open(self.path, "rb") as file:
+            file.seek(start)
+            data = file.read(end - start).decode()
+        return list(csv.reader(io.StringIO(data, newline="")))
+
+    def test_ranges_hold_whole_records(self):
+        size = os.path.getsize(self.path)
+        for chunk_bytes, block_size in [(1, 7), (50, 16), (300, 1 << 22), (size, 64)]:
+            with self.subTest(chunk_bytes=chunk_bytes, block_size=block_size):
+                ranges = split_records(self.path, 0, chunk_bytes, block_size)
+                # Contiguous, covering the whole file
+                self.assertEqual(ranges[0][0], 0)
+                self.assertEqual(ranges[-1][1], size)
+                for (_, end), (start, _) in zip(ranges, ranges[1:]):
+                    self.assertEqual(end, start)
+                records = [row for lo, hi in ranges for row in self.records(lo, hi)]
+                self.assertEqual(records, self.records(0, size))
+
+    def test_ingest(self):
+        expected = [(i, text) for i, keep, text in self.rows if keep == "yes"]
+        for workers in [1, 2]:
+            with self.subTest(workers=workers):
+                written = []
+                stats = ingest(
+                    self.path,
+                    parse_test_row,
+                    lambda batch, offset: written.extend(batch) or len(batch),
+                    workers=workers,
+                    batch_size=7,
+                    chunk_bytes=100,
+                    usecols=["id", "keep", "text"],
+                )
+                self.assertEqual(written, expected)
+                self.assertEqual((stats.rows, stats.errors), (len(self.rows), 0))
+                self.assertEqual(stats.written, len(expected))
+
+    def test_resume_from_a_batch_offset(self):
+        offsets = []
+        ingest(
+            self.path,
+            parse_test_row,
+            lambda batch, offset: offsets.append((offset, len(batch))) or len(batch),
+            batch_size=2,
+            chunk_bytes=600,
+        )
+        # Resuming from an offset only loads the rows written after it
+        offset = offsets[len(offsets) // 2][0]
+        # The first batch reporting an offset is the last one of the range ending there
+        first = [o for o, _ in offsets].index(offset)
+        done = sum(n for _, n in offsets[: first + 1])
+        written = []
+        ingest(
+            self.path,
+            parse_test_row,
+            lambda batch, offset: written.extend(batch) or len(batch),
+            start_offset=offset,
+        )
+        expected = [(i, text) for i, keep, text in self.rows if keep == "yes"]
+        self.assertEqual(written, expected[done:])
+
+    def test_missing_columns(self):
+        with self.assertRaises(KeyError):
+            ingest(self.path, parse_test_row, None, usecols=["id", "stars"])
+
+
+class MicroBatcherTests(TestCase):
+    def batcher(self, **kwargs):
+        self.batches = []
+
+        def predict(items):
+            self.batches.append(list(items))
+            return [item * 2 for item in items]
+
+        return MicroBatcher(predict, **kwargs)
+
+    def test_full_batches_do_not_wait(self):
+        batcher = self.batcher(max_batch_size=4, max_wait=30)
+        start = time.monotonic()
+        futures = [batcher.submit(i) for i in range(4)]
+        self.assertEqual([future.result(timeout=5) for future in futures], [0, 2, 4, 6])
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(self.batches, [[0, 1, 2, 3]])
+
+    def test_partial_batches_flush_after_max_wait(self):
+        batcher = self.batcher(max_batch_size=100, max_wait=0.05)
+        futures = [batcher.submit(i) for i in range(3)]
+        self.assertEqual([future.result(timeout=5) for future in futures], [0, 2, 4])
+        self.assertEqual(self.batches, [[0, 1, 2]])
+        self.assertEqual(batcher(5, timeout=5), 10)
+        self.assertEqual(batcher.stats()["batches"], 2)
+
+    def test_errors_reach_every_item_of_the_batch(self):
+        def predict(items):
+            raise ValueError("model failed")
+
+        batcher = MicroBatcher(predict, max_batch_size=2, max_wait=30)
+        futures = [batcher.submit(i) for i in range(2)]
+        for future in futures:
+            with self.assertRaises(ValueError):
+                future.result(timeout=5)
+
+
+class VerdictCacheTests(TestCase):
+    def test_texts_differing_in_case_and_spacing_share_a_verdict(self):
+        self.assertEqual(
+            normalize_text("  Great\u00a0FOOD\n\tthanks "), "great food thanks"
+        )
+        cache = VerdictCache()
+        cache.put("Great food", True)
+        self.assertIs(cache.get("great   FOOD"), True)
+        self.assertIsNone(cache.get("great food!"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = VerdictCache(max_size=2)
+        cache.put("a", True)
+        cache.put("b", False)
+        cache.get("a")
+        cache.put("c", True)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get_many(["a", "b", "c"]), [True, None, True])
+
+    def test_namespaces_do_not_share_verdicts(self):
+        self.assertNotEqual(
+            VerdictCache(namespace="v1").key("a"), VerdictCache(namespace="v2").key("a")
+        )
+
+    def test_sqlite_tier_is_shared_and_refills_memory(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = os.path.join(directory, "verdicts.sqlite3")
+        writer = VerdictCache(path=path)
+        writer.put_many(["a", "b"], [True, False])
+        # Another process: evicted from memory, found on disk
+        reader = VerdictCache(max_size=1, path=path)
+        self.assertEqual(reader.get_many(["a", "b", "c"]), [True, False, None])
+        self.assertEqual(reader.stats()["disk_hits"], 2)
+        self.assertEqual(reader.stats()["misses"], 1)
+        self.assertIs(reader.get("b"), False)
+        self.assertEqual(reader.stats()["hits"], 1)
+
+    def test_classify_predicts_distinct_uncached_texts_once(self):
+        cache = VerdictCache()
+        cache.put("known", False)
+        calls = []
+
+        def predict(texts):
+            calls.append(list(texts))
+            return [len(text) > 3 for text in texts]
+
+        verdicts = cache.classify(["known", "new", "NEW ", "longer"], predict)
+        self.assertEqual(verdicts, [False, False, False, True])
+        self.assertEqual(calls, [["new", "longer"]])
+        self.assertEqual(cache.classify(["longer"], predict), [True])
+        self.assertEqual(len(calls), 1)
+
+
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Ratings in steps of 0.5, so pages end in the middle of ties
+        create_restaurants(80)
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor(np.float32(4.5), np.int64(12), 50)
+        self.assertEqual(decode_cursor(cursor), (4.5, 12, 50))
+        for invalid in ["garbage!", encode_cursor(1, 2, 3)[:-2], "WzEsMl0"]:
+            with self.subTest(cursor=invalid), self.assertRaises(ValueError):
+                decode_cursor(invalid)
+
+    def test_rating_pages_follow_the_full_order(self):
+        ordered = list(
+            Restaurant.objects.order_by("-rating", "-pk").values_list("pk", flat=True)
+        )
+        pks, after = [], None
+        while True:
+            page = list(rating_page(Restaurant.objects.all(), 7, after))
+            pks += [restaurant.pk for restaurant in page]
+            if len(page) < 7:
+                break
+            after = (page[-1].rating, page[-1].pk)
+        self.assertEqual(pks, ordered)
+
+    def walk(self, **params):
+        names, cursor = [], None
+        while True:
+            response = self.client.get(
+                "/api/restaurants/",
+                {"page_size": 7, **params, **({"cursor": cursor} if cursor else {})},
+                HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+            )
+            data = json.loads(b"".join(response.streaming_content))
+            names += [restaurant["name"] for restaurant in data["restaurants"]]
+            cursor = data["next_cursor"]
+            if cursor is None:
+                return names
+
+    def test_api_pages_list_every_restaurant_once(self):
+        result_cache.invalidate()
+        for params in [{}, {"min_rating": 2}, {"delivery": "on"}]:
+            with self.subTest(**params):
+                restaurants = Restaurant.objects.all()
+                if "min_rating" in params:
+                    restaurants = restaurants.filter(rating__gte=2)
+                if "delivery" in params:
+                    restaurants = restaurants.filter(delivery=True)
+                expected = list(
+                    restaurants.order_by("-rating", "-pk").values_list(
+                        "name", flat=True
+                    )
+                )
+                self.assertEqual(self.walk(**params), expected)
+
+    def test_pages_are_stable_across_inserts(self):
+        response = self.client.get(
+            "/api/restaurants/",
+            {"page_size": 7},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        data = json.loads(b"".join(response.streaming_content))
+        seen = [restaurant["name"] for restaurant in data["restaurants"]]
+        # Ranked before the cursor, so not on later pages
+        Restaurant.objects.create(name="Newcomer", address="1 Side Street", rating=5.0)
+        response = self.client.get(
+            "/api/restaurants/",
+            {"page_size": 100, "cursor": data["next_cursor"]},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        rest = [
+            restaurant["name"]
+            for restaurant in json.loads(b"".join(response.streaming_content))[
+                "restaurants"
+            ]
+        ]
+        self.assertNotIn("Newcomer", rest)
+        self.assertEqual(len(seen) + len(rest), 80)
+        self.assertFalse(set(seen) & set(rest))
+
+    def test_invalid_cursors_are_rejected(self):
+        response = self.client.get(
+            "/api/restaurants/",
+            {"cursor": "garbage!"},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cursor", response.json()["errors"])
+
+
+class FilterEngineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_restaurants(200)
+        cls.cuisines = Cuisine.objects.bulk_create(
+            Cuisine(name=f"Cuisine {i}") for i in range(3)
+        )
+        cls.ambience = Ambience.objects.create(name="Cozy")
+        for i, restaurant in enumerate(Restaurant.objects.order_by("pk")):
+            restaurant.cuisines.set(cls.cuisines[i % 3 : i % 3 + i % 2 + 1])
+            if i % 4 == 0:
+                restaurant.ambiences.add(cls.ambience)
+
+    def setUp(self):
+        feature_store.invalidate()
+        feature_store.snapshot()
+
+    def test_bitmaps_match_sql(self):
+        cuisine, other = self.cuisines[:2]
+        searches = [
+            ({"delivery": True}, ["delivery"]),
+            ({"delivery": True, "take_out": True}, ["delivery", "take_out"]),
+            ({"price_range": 2}, ["price_range_2"]),
+            (
+                {"price_range": 3, "good_for_kids": True},
+                ["price_range_3", "good_for_kids"],
+            ),
+            ({"cuisines": cuisine}, [f"cuisine_{cuisine.pk}"]),
+            (
+                {"cuisines": cuisine, "delivery": True},
+                [f"cuisine_{cuisine.pk}", "delivery"],
+            ),
+            ({"ambiences": self.ambience}, [f"ambience_{self.ambience.pk}"]),
+        ]
+        for filters, keys in searches:
+            with self.subTest(keys=keys):
+                expected = sorted(
+                    Restaurant.objects.filter(**filters).values_list("pk", flat=True)
+                )
+                self.assertEqual(list(filter_engine.match(keys)), expected)
+        # Restaurants with both cuisines
+        both = Restaurant.objects.filter(cuisines=cuisine).filter(cuisines=other)
+        self.assertEqual(
+            list(filter_engine.match([f"cuisine_{cuisine.pk}", f"cuisine_{other.pk}"])),
+            sorted(both.values_list("pk", flat=True)),
+        )
+
+    def test_changes_rebuild_the_bitmaps_on_next_use(self):
+        before = filter_engine.bitmaps()
+        restaurant = Restaurant.objects.create(
+            business_id="new", name="New", address="1 Main Street", delivery=True
+        )
+        restaurant.cuisines.add(self.cuisines[2])
+        self.assertIn(restaurant.pk, filter_engine.match(["delivery"]))
+        self.assertIn(
+            restaurant.pk, filter_engine.match([f"cuisine_{self.cuisines[2].pk}"])
+        )
+        self.assertIsNot(filter_engine.bitmaps(), before)
+
+    def test_unknown_values_match_nothing(self):
+        self.assertEqual(len(filter_engine.match(["price_range_9"])), 0)
+        self.assertEqual(len(filter_engine.match(["cuisine_999999"])), 0)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i, (name, city) in enumerate(
+            [
+                ("Pizzeria Napoli", "Philadelphia"),
+                ("Joe's Pizza", "Phoenix"),
+                ("Café Olé", "Tampa"),
+                ("Philly Cheesesteaks", "Tampa"),
+            ]
+        ):
+            Restaurant.objects.create(
+                business_id=f"s{i}", name=name, address="1 Main Street", city=city
+            )
+
+    def names(self, column, term):
+        restaurants = filter_restaurants(Restaurant.objects.all(), column, term)
+        return sorted(restaurants.values_list("name", flat=True))
+
+    def test_match_query(self):
+        self.assertEqual(match_query("Pizz  phil!"), '"pizz"* "phil"*')
+        self.assertEqual(match_query("pizz", "name"), 'name : ("pizz"*)')
+        self.assertIsNone(match_query("?!"))
+
+    def test_words_match_by_prefix(self):
+        self.assertEqual(self.names("name", "pizz"), ["Joe's Pizza", "Pizzeria Napoli"])
+        self.assertEqual(self.names("name", "PIZZA joe"), ["Joe's Pizza"])
+        self.assertEqual(self.names("name", "cafe ole"), ["Café Olé"])
+        # Each column only matches its own words
+        self.assertEqual(self.names("city", "phil"), ["Pizzeria Napoli"])
+        self.assertEqual(self.names("name", "tampa"), [])
+        self.assertEqual(len(self.names("city", "!")), 4)
+
+    def test_saves_and_deletes_update_the_index(self):
+        restaurant = Restaurant.objects.get(name="Joe's Pizza")
+        restaurant.name = "Joe's Tacos"
+        restaurant.save()
+        self.assertEqual(self.names("name", "taco"), ["Joe's Tacos"])
+        self.assertEqual(self.names("name", "pizz"), ["Pizzeria Napoli"])
+        restaurant.delete()
+        self.assertEqual(self.names("name", "taco"), [])
+
+    def test_rebuild_after_bulk_loads(self):
+        Restaurant.objects.bulk_create(
+            [Restaurant(name="Bulk Burgers", address="2 Main Street", business_id="x")]
+        )
+        self.assertEqual(self.names("name", "burg"), [])
+        self.assertEqual(rebuild_index(), 5)
+        self.assertEqual(self.names("name", "burg"), ["Bulk Burgers"])
+
+
+class AutocompleteTests(TestCase):
+    def test_fold(self):
+        self.assertEqual(fold("  Café\tOLÉ  Crème "), "cafe ole creme")
+
+    def test_build_sums_popularity_and_keeps_the_most_reviewed(self):
+        index = AutocompleteIndex.build(
+            [("Subway", 10), ("Subway", 15), ("Sushi Bar", 20), ("Soup", None)],
+            max_names=2,
+        )
+        self.assertEqual(index.names, ["Subway", "Sushi Bar"])
+        self.assertEqual(index.search("s"), ["Subway", "Sushi Bar"])
+
+    def test_any_word_prefix_matches(self):
+        index = AutocompleteIndex(
+            ["Place 46 Pizza", "Pizza Hut", "Café Olé"], [5, 10, 1], precomputed=2
+        )
+        self.assertEqual(index.search("piz"), ["Pizza Hut", "Place 46 Pizza"])
+        self.assertEqual(index.search("46"), ["Place 46 Pizza"])
+        self.assertEqual(index.search("OLE"), ["Café Olé"])
+        self.assertEqual(index.search("pizza h"), ["Pizza Hut"])
+        self.assertEqual(index.search("hut pizza"), [])
+        self.assertEqual(index.search("  "), [])
+
+    def test_top_k_matches_brute_force(self):
+        rng = np.random.default_rng(0)
+        words = ["pizza", "pasta", "pho", "burger", "bar", "grill", "thai", "taco"]
+        names = sorted(
+            {
+                " ".join(rng.choice(words, size=rng.integers(1, 4))) + f" {i}"
+                for i in range(300)
+            }
+        )
+        popularity = rng.integers(0, 50, size=len(names))
+        index = AutocompleteIndex(names, popularity, precomputed=3, k=10)
+        for term in ["p", "pa", "pho", "ba", "grill", "t", "taco 1", "x"]:
+            for k in [1, 10, 25]:
+                with self.subTest(term=term, k=k):
+                    # Names with a word suffix starting with the term
+                    matches = [
+                        i
+                        for i, name in enumerate(names)
+                        if any(
+                            " ".join(name.split()[j:]).startswith(term)
+                            for j in range(len(name.split()))
+                        )
+                    ]
+                    matches.sort(key=lambda i: (-popularity[i], i))
+                    self.assertEqual(
+                        index.search(term, k), [names[i] for i in matches[:k]]
+                    )
+
+
+class GeoIndexTests(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        # A city, and points around the antimeridian and the north pole
+        self.lats = np.concatenate(
+            [
+                27.95 + rng.normal(scale=0.1, size=500),
+                rng.uniform(-10, 10, size=200),
+                rng.uniform(85, 90, size=100),
+            ]
+        )
+        self.lons = np.concatenate(
+            [
+                -82.46 + rng.normal(scale=0.1, size=500),
+                rng.choice([-1, 1], size=200) * rng.uniform(179, 180, size=200),
+                rng.uniform(-180, 180, size=100),
+            ]
+        )
+        self.pks = np.arange(1, len(self.lats) + 1) * 3
+        self.index = GeoIndex(self.pks, self.lats, self.lons)
+
+    def brute_force(self, lat, lon):
+        return haversine_km(lat, lon, self.lats, self.lons)
+
+    def test_within_matches_brute_force(self):
+        for lat, lon, radius in [
+            (27.95, -82.46, 2),
+            (27.95, -82.46, 15),
+            (0, 180, 300),
+            (0, -179.9, 50),
+            (89, 0, 200),
+            (27.95, -82.46, 0.01),
+        ]:
+            with self.subTest(lat=lat, lon=lon, radius=radius):
+                distances = self.brute_force(lat, lon)
+                pks, found = self.index.within(lat, lon, radius)
+                self.assertEqual(list(pks), sorted(self.pks[distances <= radius]))
+                np.testing.assert_allclose(
+                    found, distances[np.searchsorted(self.pks, pks)]
+                )
+
+    def test_nearest_matches_brute_force(self):
+        for lat, lon, n in [(27.95, -82.46, 10), (0, 179.95, 25), (60, 10, 5)]:
+            with self.subTest(lat=lat, lon=lon, n=n):
+                distances = self.brute_force(lat, lon)
+                order = np.lexsort((self.pks, distances))[:n]
+                pks, found = self.index.nearest(lat, lon, n)
+                self.assertEqual(list(pks), list(self.pks[order]))
+                np.testing.assert_allclose(found, distances[order])
+
+    def test_nearest_among_and_within_a_radius(self):
+        distances = self.brute_force(27.95, -82.46)
+        among = self.pks[::2]
+        pks, _ = self.index.nearest(27.95, -82.46, 5, among=among)
+        kept = np.isin(self.pks, among)
+        order = np.lexsort((self.pks[kept], distances[kept]))[:5]
+        self.assertEqual(list(pks), list(self.pks[kept][order]))
+        # Fewer than n restaurants within the radius
+        pks, found = self.index.nearest(27.95, -82.46, 1000, max_radius_km=3)
+        self.assertEqual(len(pks), np.sum(distances <= 3))
+        self.assertTrue(np.all(found <= 3))
+
+    def test_build_skips_missing_coordinates(self):
+        index = GeoIndex.build([(1, 27.9, -82.4), (2, None, -82.4), (3, 27.9, None)])
+        self.assertEqual(len(index), 1)
+
+
+class VocabularyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Cuisine.objects.bulk_create(Cuisine(name=name) for name in ["Thai", "Italian"])
+
+    def setUp(self):
+        cuisines.invalidate()
+
+    def test_list_and_etag(self):
+        response = self.client.get("/api/cuisines/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [entry["name"] for entry in response.json()], ["Thai", "Italian"]
+        )
+        self.assertIn("max-age", response["Cache-Control"])
+        etag = response["ETag"]
+        self.assertEqual(etag.strip('"'), cuisines.etag)
+
+        # Revalidation without a body, until the list changes
+        response = self.client.get("/api/cuisines/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        Cuisine.objects.create(name="Greek")
+        response = self.client.get("/api/cuisines/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()), 3)
+
+    def test_etag_only_depends_on_the_content(self):
+        etag = cuisines.etag
+        cuisines.invalidate()
+        self.assertEqual(cuisines.etag, etag)
+        self.assertEqual(cuisines.choices()[0], ("", "---------"))
+        self.assertEqual(len(cuisines.choices()), 3)
@@ -11,4 +11,5 @@ urlpatterns = [
     path("signup/", views.signup, name="signup"),
     path("login/", views.login_view, name="login"),
     path("add_review/", views.add_review, name="add_review"),
+    path("api/metrics/", views.metrics, name="metrics"),
 ]
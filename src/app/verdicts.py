@@ -0,0 +1,158 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """
+    Fold texts differing only in case, Unicode form or whitespace together.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _whitespace.sub(" ", text).strip()
+
+
+class VerdictCache:
+    """
+    Classifier verdicts keyed by a hash of the normalized review text.
+
+    Lookups go to an in-memory LRU of `max_size` entries first and then, if
+    `path` is set, to a SQLite file which several processes can share.
+    `namespace` identifies the model, so verdicts of another model are not reused.
+    """
+
+    def __init__(self, max_size=100000, path=None, namespace=""):
+        self.max_size = max_size
+        self.path = path
+        self.namespace = namespace
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def key(self, text):
+        normalized = normalize_text(text)
+        return hashlib.sha1(
+            f"{self.namespace}\0{normalized}".encode("utf-8")
+        ).hexdigest()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, text):
+        return self.get_many([text])[0]
+
+    def put(self, text, verdict):
+        self.put_many([text], [verdict])
+
+    def get_many(self, texts):
+        """
+        Cached verdicts of `texts`, None where unknown.
+        """
+        keys = [self.key(text) for text in texts]
+        verdicts = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    verdicts[i] = self._entries[key]
+                    self.hits += 1
+                else:
+                    missing.append(i)
+
+        if missing and self.path:
+            found = self._disk_get({keys[i] for i in missing})
+            for i in missing:
+                if keys[i] in found:
+                    verdicts[i] = found[keys[i]]
+            self._remember(found)
+
+        with self._lock:
+            misses = sum(verdicts[i] is None for i in missing)
+            self.disk_hits += len(missing) - misses
+            self.misses += misses
+        return verdicts
+
+    def put_many(self, texts, verdicts):
+        entries = {self.key(text): bool(v) for text, v in zip(texts, verdicts)}
+        self._remember(entries)
+        if self.path:
+            self._disk_put(entries)
+
+    def classify(self, texts, predict):
+        """
+        Verdicts of `texts`, running `predict` only on distinct uncached texts.
+        """
+        verdicts = self.get_many(texts)
+        pending = {}
+        for i, verdict in enumerate(verdicts):
+            if verdict is None:
+                pending.setdefault(self.key(texts[i]), []).append(i)
+        if pending:
+            first = [texts[indices[0]] for indices in pending.values()]
+            predicted = predict(first)
+            for indices, verdict in zip(pending.values(), predicted):
+                for i in indices:
+                    verdicts[i] = bool(verdict)
+            self.put_many(first, predicted)
+        return verdicts
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+    def _remember(self, entries):
+        with self._lock:
+            for key, verdict in entries.items():
+                self._entries[key] = verdict
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    # Helper functions for the SQLite tier, one connection per thread
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts "
+                "(key TEXT PRIMARY KEY, fake INTEGER NOT NULL)"
+            )
+            self._local.connection = connection
+        return connection
+
+    def _disk_get(self, keys):
+        keys = list(keys)
+        found = {}
+        # Stay below SQLite's limit on query parameters
+        for i in range(0, len(keys), 500):
+            chunk = keys[i : i + 500]
+            rows = self._connection().execute(
+                f"SELECT key, fake FROM verdicts WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            found.update((key, bool(fake)) for key, fake in rows)
+        return found
+
+    def _disk_put(self, entries):
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO verdicts (key, fake) VALUES (?, ?)",
+                [(key, int(verdict)) for key, verdict in entries.items()],
+            )
@@ -1,7 +1,7 @@
 from datetime import date, datetime
 
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from .models import Restaurant, Review
@@ -13,10 +13,12 @@ from django.forms.models import model_to_dict
 from rest_framework.decorators import api_view
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.models import User as AuthUser
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from django.http import JsonResponse
 from django.shortcuts import render
-from django.apps import apps
+from django.conf import settings
 
 from rest_framework import status
 from rest_framework.authtoken.models import Token
@@ -25,13 +27,55 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from .forms import RestaurantFilterForm
-from .models import Restaurant, Cuisine, Review, Ambience, User as CustomUser
+from .models import Restaurant, Review, User as CustomUser
 
 import json
-import torch
 
+import numpy as np
 
+from .autocomplete import autocomplete_store
+from .batching import MicroBatcher
+from .bitmaps import filter_engine
+from .classifier import MODEL_NAME, classifier
+from .geo import geo_store
+from .hours import hours_store, slot_of
+from .pagination import encode_cursor, rating_page
+from .ranking import hydrate
 from .recommender import Recommender
+from .results import result_cache
+from .search import filter_restaurants
+from .serializers import prefetch_categories, stream_restaurants
+from .verdicts import VerdictCache
+from . import vocabularies
+
+# Boolean filters of RestaurantFilterForm, matched when checked
+AMENITY_FILTERS = [
+    "delivery",
+    "good_for_kids",
+    "good_for_groups",
+    "take_out",
+    "reservations",
+    "outdoor_seating",
+    "wheelchair_accessible",
+    "bike_parking",
+    "credit_cards_accepted",
+    "happy_hour",
+    "dogs_allowed",
+    "sustainable",
+]
+
+# Concurrent add_review submissions share one padded forward pass
+review_batcher = MicroBatcher(
+    classifier.predict,
+    max_batch_size=settings.REVIEW_CLASSIFIER_BATCH_SIZE,
+    max_wait=settings.REVIEW_CLASSIFIER_MAX_WAIT_MS / 1000,
+)
+# Resubmitted texts are answered without running the model again
+verdict_cache = VerdictCache(
+    max_size=settings.REVIEW_VERDICT_CACHE_SIZE,
+    path=settings.REVIEW_VERDICT_CACHE_PATH,
+    namespace=settings.REVIEW_CLASSIFIER_ARTIFACT or MODEL_NAME,
+)
 
 
 @api_view(["POST"])
@@ -106,14 +150,18 @@ class HomeAPIView(APIView):
         return Response({"message": "Welcome to the Restaurant Recommender!"})
 
 
+# Browsers revalidate the lists with If-None-Match and get 304 Not Modified
+@cache_control(max_age=settings.VOCABULARY_MAX_AGE)
+@condition(etag_func=lambda request: vocabularies.cuisines.etag)
 def cuisine_list(request):
-    cuisines = Cuisine.objects.all().values("id", "name")  # Return id and name
-    return JsonResponse(list(cuisines), safe=False)
+    # [{"id": ..., "name": ...}], serialized once per change
+    return HttpResponse(vocabularies.cuisines.json, content_type="application/json")
 
 
+@cache_control(max_age=settings.VOCABULARY_MAX_AGE)
+@condition(etag_func=lambda request: vocabularies.ambiences.etag)
 def ambience_list(request):
-    ambiences = Ambience.objects.all().values("id", "name")  # Return id and name
-    return JsonResponse(list(ambiences), safe=False)
+    return HttpResponse(vocabularies.ambiences.json, content_type="application/json")
 
 
 def home(request):
@@ -130,239 +178,148 @@ def home(request):
             ambience = form.cleaned_data.get("ambience")
             min_rating = form.cleaned_data.get("min_rating")
             open_now = form.cleaned_data.get("open_now")
+            open_for = form.cleaned_data.get("open_for")
             city = form.cleaned_data.get("city")
             price_range = form.cleaned_data.get("price_range")
-            delivery = form.cleaned_data.get("delivery")
-            good_for_kids = form.cleaned_data.get("good_for_kids")
-            good_for_groups = form.cleaned_data.get("good_for_groups")
-            take_out = form.cleaned_data.get("take_out")
-            reservations = form.cleaned_data.get("reservations")
-            outdoor_seating = form.cleaned_data.get("outdoor_seating")
-            wheelchair_accessible = form.cleaned_data.get("wheelchair_accessible")
-            bike_parking = form.cleaned_data.get("bike_parking")
-            credit_cards_accepted = form.cleaned_data.get("credit_cards_accepted")
-            happy_hour = form.cleaned_data.get("happy_hour")
-            dogs_allowed = form.cleaned_data.get("dogs_allowed")
-            sustainable = form.cleaned_data.get("sustainable")
 
             # Apply filters
             if name != "" and name is not None:
-                restaurants = restaurants.filter(name__icontains=name)
-
-            if cuisine != "" and cuisine is not None:
-                # `cuisine` is a Cuisine instance because of ModelChoiceField
-                restaurants = restaurants.filter(cuisines__id=cuisine.id)
-
-            if ambience != "" and ambience is not None:
-                # Ambience is received as an ID, filter by it
-                restaurants = restaurants.filter(ambiences__id=ambience.id)
+                restaurants = filter_restaurants(restaurants, "name", name)
 
             if min_rating != "" and min_rating is not None:
                 restaurants = restaurants.filter(rating__gte=min_rating)
-            if open_now:
-                # Determine current day and time
-                now = datetime.now()
-                current_day = now.strftime("%A").lower()  # e.g., "monday", "tuesday"
-                current_time = now.time()
-
-                # Dynamically filter based on opening and closing times
-                open_field = f"{current_day}_open"
-                close_field = f"{current_day}_close"
-
-                restaurants = restaurants.filter(
-                    **{
-                        f"{open_field}__lte": current_time,  # Open before or at the current time
-                        f"{close_field}__gte": current_time,  # Close after or at the current time
-                    }
-                )
             if city != "" and city is not None:
-                restaurants = restaurants.filter(city__icontains=city)
+                restaurants = filter_restaurants(restaurants, "city", city)
+
+            # Attribute filters are bitwise ANDs of in-memory bitmaps (app/bitmaps.py)
+            keys = [flag for flag in AMENITY_FILTERS if form.cleaned_data.get(flag)]
             if price_range != "" and price_range is not None:
-                restaurants = restaurants.filter(price_range=int(price_range))
-            if delivery != "" and delivery is not None and delivery is not False:
-                restaurants = restaurants.filter(delivery=delivery)
-            if (
-                good_for_kids != ""
-                and good_for_kids is not None
-                and good_for_kids is not False
-            ):
-                restaurants = restaurants.filter(good_for_kids=good_for_kids)
-            if (
-                good_for_groups != ""
-                and good_for_groups is not None
-                and good_for_groups is not False
-            ):
-                restaurants = restaurants.filter(good_for_groups=good_for_groups)
-
-            if take_out != "" and take_out is not None and take_out is not False:
-                restaurants = restaurants.filter(take_out=take_out)
-            if (
-                reservations != ""
-                and reservations is not None
-                and reservations is not False
-            ):
-                restaurants = restaurants.filter(reservations=reservations)
-            if (
-                outdoor_seating != ""
-                and outdoor_seating is not None
-                and outdoor_seating is not False
-            ):
-                restaurants = restaurants.filter(outdoor_seating=outdoor_seating)
-            if (
-                wheelchair_accessible != ""
-                and wheelchair_accessible is not None
-                and wheelchair_accessible is not False
-            ):
-                restaurants = restaurants.filter(
-                    wheelchair_accessible=wheelchair_accessible
+                keys.append(f"price_range_{int(price_range)}")
+            if cuisine is not None:
+                # `cuisine` and `ambience` are primary keys
+                keys.append(f"cuisine_{cuisine}")
+            if ambience is not None:
+                keys.append(f"ambience_{ambience}")
+            candidates = filter_engine.match(keys) if keys else None
+
+            if open_now or open_for:
+                # Slots of the week from the opening-hours index (app/hours.py)
+                hours = hours_store.index()
+                open_pks = (
+                    hours.open_during(datetime.now(), open_for)
+                    if open_for
+                    else hours.open_at(datetime.now())
                 )
-            if (
-                bike_parking != ""
-                and bike_parking is not None
-                and bike_parking is not False
-            ):
-                restaurants = restaurants.filter(bike_parking=bike_parking)
-            if (
-                credit_cards_accepted != ""
-                and credit_cards_accepted is not None
-                and credit_cards_accepted is not False
-            ):
-                restaurants = restaurants.filter(
-                    credit_cards_accepted=credit_cards_accepted
+                candidates = (
+                    open_pks
+                    if candidates is None
+                    else np.intersect1d(candidates, open_pks, assume_unique=True)
                 )
 
-            if happy_hour != "" and happy_hour is not None and happy_hour is not False:
-                restaurants = restaurants.filter(happy_hour=happy_hour)
-            if (
-                dogs_allowed != ""
-                and dogs_allowed is not None
-                and dogs_allowed is not False
-            ):
-                restaurants = restaurants.filter(dogs_allowed=dogs_allowed)
-            if (
-                sustainable != ""
-                and sustainable is not None
-                and sustainable is not False
-            ):
-                restaurants = restaurants.filter(sustainable=sustainable)
-            now = datetime.now()
-            current_day = now.strftime("%A").lower()  # e.g., "monday", "tuesday"
-            current_time = now.time()
-
-            # Dynamically filter based on opening and closing times
-            open_field = f"{current_day}_open"
-            close_field = f"{current_day}_close"
+            latitude = form.cleaned_data.get("latitude")
+            longitude = form.cleaned_data.get("longitude")
+            if latitude is not None and longitude is not None:
+                # Grid cells around the location (app/geo.py)
+                geo = geo_store.index()
+                radius = form.cleaned_data.get("radius")
+                nearest = form.cleaned_data.get("nearest")
+                if nearest:
+                    near_pks, _ = geo.nearest(
+                        latitude, longitude, nearest, radius, among=candidates
+                    )
+                    near_pks = np.sort(near_pks)
+                else:
+                    near_pks, _ = geo.within(
+                        latitude, longitude, radius or settings.GEO_DEFAULT_RADIUS_KM
+                    )
+                candidates = (
+                    near_pks
+                    if candidates is None
+                    else np.intersect1d(candidates, near_pks, assume_unique=True)
+                )
 
+            # Pagination parameters alone do not ask for recommendations
             filters_applied = any(
-                value for key, value in request.GET.items() if value.strip()
+                value
+                for key, value in request.GET.items()
+                if key not in ("cursor", "page_size") and value.strip()
             )
+            is_xhr = request.headers.get("X-Requested-With") == "XMLHttpRequest"
+            page_size = (
+                form.cleaned_data.get("page_size") or settings.RESTAURANT_PAGE_SIZE
+            )
+            cursor = form.cleaned_data.get("cursor") if is_xhr else None
             if filters_applied:
-                print("Recommender engine inference...")
-                recommender = Recommender(
-                    businesses=restaurants, reviews=Review.objects.all()
+                # One extra restaurant tells whether there is a next page
+                top_n = page_size + 1 if is_xhr else 500
+                # Results of popular searches are reused until a restaurant or
+                # review changes, opening-hours filters also depend on the time
+                key = result_cache.key(
+                    form.cleaned_data,
+                    request.user.id,
+                    top_n,
+                    settings.RECOMMENDER_MODE,
+                    slot_of(datetime.now()) if open_now or open_for else None,
                 )
-                recommender.fit(
-                    user_id=request.user.id
-                )  # Fit with the current user's data
-                restaurants = recommender.predict(businesses=restaurants)
-
-            if request.headers.get("X-Requested-With") == "XMLHttpRequest":
-                if restaurants.count() > 500:
-                    limited_restaurants = restaurants[:500]
-                    restaurant_data = [
-                        {
-                            "name": restaurant.name,
-                            "cuisine": [
-                                c.name for c in restaurant.cuisines.all()
-                            ],  # Extract related field
-                            "ambience": [a.name for a in restaurant.ambiences.all()],
-                            "rating": restaurant.rating,
-                            "city": restaurant.city,
-                            "price_range": restaurant.price_range,
-                            "delivery": restaurant.delivery,
-                            "good_for_kids": restaurant.good_for_kids,
-                            "good_for_groups": restaurant.good_for_groups,
-                            "take_out": restaurant.take_out,
-                            "reservations": restaurant.reservations,
-                            "outdoor_seating": restaurant.outdoor_seating,
-                            "wheelchair_accessible": restaurant.wheelchair_accessible,
-                            "bike_parking": restaurant.bike_parking,
-                            "credit_cards_accepted": restaurant.credit_cards_accepted,
-                            "happy_hour": restaurant.happy_hour,
-                            "dogs_allowed": restaurant.dogs_allowed,
-                            "sustainable": restaurant.sustainable,
-                            "latitude": restaurant.latitude,
-                            "longitude": restaurant.longitude,
-                            "monday_open": restaurant.monday_open,
-                            "monday_close": restaurant.monday_close,
-                            "tuesday_open": restaurant.tuesday_open,
-                            "tuesday_close": restaurant.tuesday_close,
-                            "wednesday_open": restaurant.wednesday_open,
-                            "wednesday_close": restaurant.wednesday_close,
-                            "thursday_open": restaurant.thursday_open,
-                            "thursday_close": restaurant.thursday_close,
-                            "friday_open": restaurant.friday_open,
-                            "friday_close": restaurant.friday_close,
-                            "saturday_open": restaurant.saturday_open,
-                            "saturday_close": restaurant.saturday_close,
-                            "sunday_open": restaurant.sunday_open,
-                            "sunday_close": restaurant.sunday_close,
-                        }
-                        for restaurant in limited_restaurants
-                    ]
-
-                    return JsonResponse({"restaurants": restaurant_data}, safe=False)
+                ranked = result_cache.get(key)
+                if ranked is not None:
+                    restaurants = hydrate(restaurants, *ranked)
                 else:
-                    restaurant_data = [
-                        {
-                            "name": restaurant.name,
-                            "cuisine": [
-                                c.name for c in restaurant.cuisines.all()
-                            ],  # Extract related field
-                            "ambience": [a.name for a in restaurant.ambiences.all()],
-                            "rating": restaurant.rating,
-                            "city": restaurant.city,
-                            "price_range": restaurant.price_range,
-                            "delivery": restaurant.delivery,
-                            "good_for_kids": restaurant.good_for_kids,
-                            "good_for_groups": restaurant.good_for_groups,
-                            "take_out": restaurant.take_out,
-                            "reservations": restaurant.reservations,
-                            "outdoor_seating": restaurant.outdoor_seating,
-                            "wheelchair_accessible": restaurant.wheelchair_accessible,
-                            "bike_parking": restaurant.bike_parking,
-                            "credit_cards_accepted": restaurant.credit_cards_accepted,
-                            "happy_hour": restaurant.happy_hour,
-                            "dogs_allowed": restaurant.dogs_allowed,
-                            "sustainable": restaurant.sustainable,
-                            "latitude": restaurant.latitude,
-                            "longitude": restaurant.longitude,
-                            "monday_open": restaurant.monday_open,
-                            "monday_close": restaurant.monday_close,
-                            "tuesday_open": restaurant.tuesday_open,
-                            "tuesday_close": restaurant.tuesday_close,
-                            "wednesday_open": restaurant.wednesday_open,
-                            "wednesday_close": restaurant.wednesday_close,
-                            "thursday_open": restaurant.thursday_open,
-                            "thursday_close": restaurant.thursday_close,
-                            "friday_open": restaurant.friday_open,
-                            "friday_close": restaurant.friday_close,
-                            "saturday_open": restaurant.saturday_open,
-                            "saturday_close": restaurant.saturday_close,
-                            "sunday_open": restaurant.sunday_open,
-                            "sunday_close": restaurant.sunday_close,
-                        }
-                        for restaurant in restaurants
+                    print("Recommender engine inference...")
+                    recommender = Recommender(
+                        businesses=restaurants, reviews=Review.objects.all()
+                    )
+                    recommender.fit(
+                        user_id=request.user.id
+                    )  # Fit with the current user's data
+                    restaurants = recommender.predict(
+                        businesses=restaurants,
+                        top_n=top_n,
+                        mode=settings.RECOMMENDER_MODE,
+                        after=cursor,
+                        candidates=candidates,
+                    )
+                    scores = [
+                        getattr(r, "recommendation_score", None) for r in restaurants
+                    ]
+                    result_cache.set(
+                        key,
+                        [r.pk for r in restaurants],
+                        scores if None not in scores else None,
+                    )
+
+            if is_xhr:
+                if isinstance(restaurants, list):
+                    keys = [
+                        (getattr(r, "recommendation_score", r.rating), r.pk)
+                        for r in restaurants
                     ]
+                else:
+                    restaurants = rating_page(restaurants, page_size + 1, cursor)
+                    keys = list(restaurants.values_list("rating", "pk"))
+
+                next_cursor = None
+                if len(keys) > page_size:
+                    depth = (cursor[2] if cursor else 0) + page_size
+                    next_cursor = encode_cursor(*keys[page_size - 1], depth)
+                # Works for both querysets and ranked recommendation lists
+                return StreamingHttpResponse(
+                    stream_restaurants(
+                        restaurants[:page_size], extra={"next_cursor": next_cursor}
+                    ),
+                    content_type="application/json",
+                )
 
-                    # return render(
-                    #         request, "restaurant_list.html", {"form": form, "restaurants": top_recommendations}
-                    #     )
-                    return JsonResponse({"restaurants": restaurant_data}, safe=False)
+        elif request.headers.get("X-Requested-With") == "XMLHttpRequest":
+            return JsonResponse({"errors": form.errors}, status=400)
 
     else:
         form = RestaurantFilterForm()
 
+    if isinstance(restaurants, list):
+        restaurants = prefetch_categories(restaurants[:500])
+    else:
+        restaurants = prefetch_categories(restaurants)[:500]
     return render(
         request, "restaurant_list.html", {"form": form, "restaurants": restaurants}
     )
@@ -422,25 +379,27 @@ def add_review(request):
 
 def autocomplete_restaurants(request):
     if "term" in request.GET:
-        qs = Restaurant.objects.filter(name__icontains=request.GET.get("term"))[:10]
-        names = list(qs.values_list("name", flat=True))
+        # Names with a word starting with the term, most reviewed first
+        names = autocomplete_store.search(request.GET.get("term"), k=10)
         return JsonResponse(names, safe=False)
     return JsonResponse([], safe=False)
 
 
-def filter_review(review_text: str) -> str:
-    # Access the pre-loaded model and tokenizer from the AppConfig
-    filter_config = apps.get_app_config("app")
-    model = filter_config.model
-    tokenizer = filter_config.tokenizer
-    device = filter_config.device
-
-    inputs = tokenizer(review_text, return_tensors="pt", padding=True, truncation=True)
-    inputs = {key: value.to(device) for key, value in inputs.items()}
+def filter_review(review_text: str) -> bool:
+    verdict = verdict_cache.get(review_text)
+    if verdict is None:
+        # The model is loaded lazily on the first call, requests are batched together
+        verdict = review_batcher(review_text)
+        verdict_cache.put(review_text, verdict)
+    return verdict
 
-    with torch.no_grad():
-        outputs = model(**inputs)
-        probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-        prediction = torch.argmax(probs, dim=-1).item()
 
-    return True if prediction == 1 else False
+def metrics(request):
+    return JsonResponse(
+        {
+            "review_classifier": review_batcher.stats(),
+            "review_verdict_cache": verdict_cache.stats(),
+            "autocomplete": autocomplete_store.stats(),
+            "search_results": result_cache.stats(),
+        }
+    )
@@ -0,0 +1,46 @@
+import hashlib
+import json
+
+from .models import Ambience, Cuisine
+from .stores import LazyIndex
+
+
+class Vocabulary(LazyIndex):
+    """
+    Process-wide list of the (id, name) pairs of a category model, with its
+    JSON and an ETag hashing the content, so every worker tags the same list
+    the same way.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def build(self):
+        entries = list(self.model.objects.order_by("pk").values("id", "name"))
+        content = json.dumps(entries).encode("utf-8")
+        return entries, content, hashlib.sha1(content).hexdigest()[:16]
+
+    @property
+    def entries(self):
+        return self.index()[0]
+
+    @property
+    def json(self):
+        """
+        The entries as a JSON list of {"id", "name"} objects.
+        """
+        return self.index()[1]
+
+    @property
+    def etag(self):
+        return self.index()[2]
+
+    def choices(self):
+        return [("", "---------")] + [
+            (entry["id"], entry["name"]) for entry in self.entries
+        ]
+
+
+cuisines = Vocabulary(Cuisine)
+ambiences = Vocabulary(Ambience)
@@ -137,3 +137,57 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Local memory is per process; a FileBasedCache or Redis lets workers share entries
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+# Seconds browsers may reuse /api/cuisines/ and /api/ambiences/ before revalidating their ETag
+VOCABULARY_MAX_AGE = 300
+
+# Seconds before a worker notices that another process changed restaurants (app/stores.py)
+DATA_VERSION_CHECK_INTERVAL = 1.0
+
+
+# Recommender engine
+# "exact" scores every candidate, "ann" searches the inverted-file index (app/ann.py),
+# "cf" uses the collaborative-filtering model (app/cf.py)
+RECOMMENDER_MODE = "exact"
+# Restaurants per page of /api/restaurants/ unless the client asks for `page_size`
+RESTAURANT_PAGE_SIZE = 50
+# Ranked results of searches (app/results.py) are kept in this cache for RESULT_CACHE_TIMEOUT
+# seconds, e.g. a "results" alias using django.core.cache.backends.filebased.FileBasedCache
+RESULT_CACHE_ALIAS = "default"
+RESULT_CACHE_TIMEOUT = 600
+# Radius of /api/restaurants/?latitude=..&longitude=.. searches without `radius` or `nearest`
+GEO_DEFAULT_RADIUS_KM = 5
+# Optional index built offline with `manage.py build_ann_index`
+RECOMMENDER_ANN_INDEX = None
+# Searches of at most this many restaurants are scored exactly in "ann" mode
+RECOMMENDER_ANN_MIN_CANDIDATES = 20000
+# Factors trained with `manage.py train_cf`, memory-mapped by every worker
+RECOMMENDER_CF_MODEL = BASE_DIR.parent / "data" / "cf_model"
+
+
+# Restaurant name autocomplete (app/autocomplete.py)
+# Build the index in a background thread at startup instead of on the first search
+AUTOCOMPLETE_PRELOAD = False
+# Only the most reviewed names are indexed, None for all of them (see /api/metrics/)
+AUTOCOMPLETE_MAX_NAMES = 200000
+
+
+# Review classifier (app/classifier.py)
+# Load it in a background thread at startup instead of on first use
+REVIEW_CLASSIFIER_PRELOAD = False
+# Directory written by `manage.py export_review_classifier`, None for the PyTorch model
+REVIEW_CLASSIFIER_ARTIFACT = None
+# Verdicts cached by normalized text (app/verdicts.py); the SQLite file is shared by workers
+REVIEW_VERDICT_CACHE_SIZE = 100000
+REVIEW_VERDICT_CACHE_PATH = None
+# Micro-batching of concurrent classifications (app/batching.py)
+REVIEW_CLASSIFIER_BATCH_SIZE = 32
+REVIEW_CLASSIFIER_MAX_WAIT_MS = 5
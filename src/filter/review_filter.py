@@ -1,26 +1,18 @@
-from transformers import (
-    AutoTokenizer,
-    AutoModelForSequenceClassification,
-    DataCollatorWithPadding,
-)
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
 import pandas as pd
-import torch
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import DataLoader
 from tqdm import tqdm
 
-
-# Define a custom dataset
-class ReviewDataset(Dataset):
-    def __init__(self, reviews, tokenizer):
-        self.reviews = reviews
-        self.tokenizer = tokenizer
-
-    def __len__(self):
-        return len(self.reviews)
-
-    def __getitem__(self, idx):
-        # Tokenize and return only necessary fields
-        return self.tokenizer(self.reviews[idx], truncation=True, padding=False)
+# Share the classifier (and its exported CPU runtimes) with the web app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from app.classifier import MODEL_NAME, ReviewClassifier  # noqa: E402
+from app.verdicts import VerdictCache  # noqa: E402
 
 
 def get_sample_reviews(df: pd.DataFrame, n: int = 1000000):
@@ -34,46 +26,205 @@ def get_sample_reviews(df: pd.DataFrame, n: int = 1000000):
     df.to_csv("../../data/yelp_academic_dataset_review_1MLN.csv", index=False)
 
 
-def filter_reviews(df: pd.DataFrame) -> pd.DataFrame:
-    # Load the model and tokenizer
-    model_name = "zayuki/computer_generated_fake_review_detection"
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForSequenceClassification.from_pretrained(model_name, from_tf=True)
-
-    # Check for GPU availability and move the model to GPU if available
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    model.to(device)
-
-    # Create dataset and dataloader
-    dataset = ReviewDataset(df["text"].tolist(), tokenizer)
-    data_collator = DataCollatorWithPadding(tokenizer=tokenizer)
-    dataloader = DataLoader(dataset, batch_size=16, collate_fn=data_collator)
-
-    # Process batches
-    classifications = []
-    for batch in tqdm(dataloader):
-        # Prepare inputs for the model
-        inputs = {key: value.to(device) for key, value in batch.items()}
-        outputs = model(**inputs)
-        probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-        predictions = torch.argmax(probs, dim=-1).tolist()
-        classifications.extend(
-            ["fake" if pred == 1 else "genuine" for pred in predictions]
-        )
+class Tokenize:
+    """
+    Collate function tokenizing a batch of texts inside a DataLoader worker process.
+    """
+
+    def __init__(self, tokenizer, options):
+        self.tokenizer = tokenizer
+        self.options = options
+
+    def __call__(self, texts):
+        return self.tokenizer(texts, **self.options)
 
-    # Update the dataframe with classifications
-    df["classification"] = classifications
+
+def length_buckets(texts, batch_size):
+    """
+    Batches of indices of texts of similar length, so little padding is needed.
+    Character length is a cheap stand-in for the token length.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    return [order[i : i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def run_model(texts, classifier, batch_size=64, workers=2):
+    """
+    Classify texts in length-bucketed batches tokenized by `workers` processes.
+    """
+    classifier.load()
+    batches = length_buckets(texts, batch_size)
+    loader = DataLoader(
+        texts,
+        batch_sampler=batches,
+        collate_fn=Tokenize(classifier.tokenizer, classifier.encode_options()),
+        num_workers=workers,
+    )
+    predictions = [False] * len(texts)
+    # Batches come back in sampler order, also with several workers
+    for indices, inputs in zip(batches, loader):
+        for i, logits in zip(indices, classifier.forward(inputs)):
+            predictions[i] = bool(logits.argmax() == 1)
+    return predictions
+
+
+def classify_texts(texts, classifier, cache, batch_size=64, workers=2):
+    """
+    Verdicts of texts, True meaning fake. Cached and duplicate texts skip the model.
+    """
+    return cache.classify(
+        list(texts),
+        lambda pending: run_model(pending, classifier, batch_size, workers),
+    )
+
+
+def filter_reviews(
+    df: pd.DataFrame,
+    artifact: str = None,
+    batch_size: int = 64,
+    cache_path: str = None,
+    workers: int = 2,
+) -> pd.DataFrame:
+    """
+    Classify reviews as fake or genuine. `artifact` is a model exported by
+    `manage.py export_review_classifier`, the full PyTorch model is used without it.
+    Duplicate texts are classified once; `cache_path` keeps verdicts across runs.
+    """
+    classifier = ReviewClassifier(artifact=artifact)
+    cache = VerdictCache(path=cache_path, namespace=artifact or MODEL_NAME)
+    verdicts = classify_texts(
+        df["text"].fillna("").astype(str), classifier, cache, batch_size, workers
+    )
+    df["classification"] = ["fake" if verdict else "genuine" for verdict in verdicts]
     return df
 
 
+# Helper functions for resumable runs
+
+
+def load_checkpoint(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path, checkpoint):
+    # Written to a temporary file first, so a crash never leaves half a checkpoint
+    with open(path + ".tmp", "w") as file:
+        json.dump(checkpoint, file)
+    os.replace(path + ".tmp", path)
+
+
+def filter_reviews_file(
+    input_path: str,
+    output_path: str,
+    artifact: str = None,
+    chunksize: int = 20000,
+    batch_size: int = 64,
+    workers: int = 2,
+    cache_path: str = None,
+):
+    """
+    Classify the reviews of a CSV file chunk by chunk, appending each classified
+    chunk to `output_path`. Progress is checkpointed after every chunk, so an
+    interrupted run continues where it stopped when started again.
+    """
+    checkpoint_path = output_path + ".checkpoint"
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint is not None and os.path.exists(output_path):
+        # Drop output written after the last checkpoint
+        with open(output_path, "r+b") as file:
+            file.truncate(checkpoint["output_bytes"])
+        chunksize = checkpoint["chunksize"]
+    else:
+        checkpoint = {"rows": 0, "output_bytes": 0, "chunksize": chunksize}
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    classifier = ReviewClassifier(artifact=artifact)
+    cache = VerdictCache(path=cache_path, namespace=artifact or MODEL_NAME)
+    rows = checkpoint["rows"]
+    processed = 0
+    start = time.perf_counter()
+
+    with tqdm(unit=" reviews", initial=rows) as progress:
+        # Rows classified by an interrupted run are skipped by the parser, the
+        # header being row 0
+        chunks = pd.read_csv(
+            input_path, chunksize=chunksize, skiprows=range(1, rows + 1)
+        )
+        for chunk in chunks:
+            rows += len(chunk)
+            verdicts = classify_texts(
+                chunk["text"].fillna("").astype(str),
+                classifier,
+                cache,
+                batch_size,
+                workers,
+            )
+            chunk["classification"] = [
+                "fake" if verdict else "genuine" for verdict in verdicts
+            ]
+            chunk.to_csv(
+                output_path,
+                mode="a",
+                header=checkpoint["output_bytes"] == 0,
+                index=False,
+            )
+
+            checkpoint["rows"] = rows
+            checkpoint["output_bytes"] = os.path.getsize(output_path)
+            save_checkpoint(checkpoint_path, checkpoint)
+            processed += len(chunk)
+            progress.update(len(chunk))
+
+    # The run is complete, a new one starts from scratch. Empty inputs never
+    # wrote a checkpoint
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(checkpoint_path)
+    elapsed = time.perf_counter() - start
+    stats = cache.stats()
+    print(
+        f"Classified {processed} reviews in {elapsed:.1f}s "
+        f"({processed / max(elapsed, 1e-9):.1f} reviews/s), "
+        f"{stats['hits'] + stats['disk_hits']} answered from the verdict cache"
+    )
+
+
 if __name__ == "__main__":
     """
     This is a script to perform review filtering offline on YELP dataset.
-    For online filtering, the model is created in app/apps.py and used in app/views.py.
-    """
-    # Load data
-    df = pd.read_csv("../../data/yelp_academic_dataset_review_1MLN.csv")
-    # Filter reviews
-    df = filter_reviews(df)
-    # Save the filtered reviews
-    df.to_csv("../../data/yelp_academic_dataset_review_1MLN_filtered.csv", index=False)
+    For online filtering, the model is defined in app/classifier.py and used in app/views.py.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--input", default="../../data/yelp_academic_dataset_review_1MLN.csv"
+    )
+    parser.add_argument(
+        "--output", default="../../data/yelp_academic_dataset_review_1MLN_filtered.csv"
+    )
+    parser.add_argument(
+        "--artifact",
+        help="Quantized model directory written by export_review_classifier.",
+    )
+    parser.add_argument(
+        "--cache", help="SQLite file caching verdicts across runs and processes."
+    )
+    parser.add_argument("--chunksize", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument(
+        "--workers", type=int, default=2, help="Tokenizer worker processes."
+    )
+    args = parser.parse_args()
+
+    filter_reviews_file(
+        args.input,
+        args.output,
+        artifact=args.artifact,
+        chunksize=args.chunksize,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        cache_path=args.cache,
+    )
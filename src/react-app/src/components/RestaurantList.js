@@ -103,10 +103,14 @@ const getAllOpenHours = (restaurant) => {
 };
 
 
+// Restaurants fetched per request, more are loaded with the returned cursor
+const PAGE_SIZE = 50;
+
 const RestaurantList = () => {
   const navigate = useNavigate();
   const [restaurantCount, setRestaurantCount] = useState(0); 
   const [restaurants, setRestaurants] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [cuisines, setCuisines] = useState([]);
   const [ambiences, setAmbiences] = useState([]);
   const [filters, setFilters] = useState({
@@ -166,9 +170,14 @@ const RestaurantList = () => {
     }
   };
 
-  const fetchRestaurants = async () => {
+  const fetchRestaurants = async (cursor = null) => {
     try {
-        const queryParams = new URLSearchParams(filters).toString();
+        const params = new URLSearchParams(filters);
+        params.set("page_size", PAGE_SIZE);
+        if (cursor) {
+            params.set("cursor", cursor);
+        }
+        const queryParams = params.toString();
         const response = await fetch(`http://127.0.0.1:8000/api/restaurants/?${queryParams}`, {
             method: "GET",
             headers: {
@@ -181,8 +190,15 @@ const RestaurantList = () => {
         }
 
         const data = await response.json();
-        setRestaurants(data.restaurants);
-        setRestaurantCount(data.restaurants.length);
+        if (cursor) {
+            // Next page of the same search
+            setRestaurants((prev) => [...prev, ...data.restaurants]);
+            setRestaurantCount((prev) => prev + data.restaurants.length);
+        } else {
+            setRestaurants(data.restaurants);
+            setRestaurantCount(data.restaurants.length);
+        }
+        setNextCursor(data.next_cursor);
     } catch (error) {
         console.error("Error fetching restaurants:", error);
     }
@@ -496,6 +512,11 @@ const RestaurantList = () => {
                   ))}
                 </tbody>
               </table>
+              {nextCursor && (
+                <button style={styles.button} onClick={() => fetchRestaurants(nextCursor)}>
+                  Load more
+                </button>
+              )}
             </div>
           )}
        